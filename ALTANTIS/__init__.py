@@ -1 +1,5 @@
-from ALTANTIS.bot import run_bot
\ No newline at end of file
+def run_bot():
+    # Imported here so that importing ALTANTIS (e.g. to run the game headlessly)
+    # doesn't construct the Discord bot.
+    from ALTANTIS.bot import run_bot as run
+    run()
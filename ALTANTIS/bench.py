@@ -0,0 +1,91 @@
+"""
+Benchmarks the tick engine without Discord. From the repository root, run e.g.
+
+    python -m ALTANTIS.bench --size 100 --subs 10 --npcs 200 --ticks 50
+
+and it will build a random world of that size, run that many ticks and report
+the ticks per second and the latency of each phase of the tick (along with the
+slowest subs and NPC types, as in !tickstats).
+"""
+
+import argparse, asyncio, random, time
+from typing import List, Optional
+
+from ALTANTIS.headless import new_headless_game, add_headless_sub, headless_tick
+from ALTANTIS.npcs.npc import add_npc, get_npc_types
+from ALTANTIS.subs.state import get_sub_objects
+from ALTANTIS.world.world import get_square, possible_directions
+from ALTANTIS.utils.profiler import tick_profiler
+
+# Attributes (and their values) that we scatter around the map.
+FEATURES = [("deposit", "Deposit"), ("diverse", "Reef"), ("ruins", "Ruins"),
+            ("junk", "Wreck"), ("hiddenness", 3), ("weather", "rough"),
+            ("weather", "calm"), ("weather", "stormy"), ("obstacle", "")]
+
+def build_world(width : int, height : int, features : float, subs : int, npcs : int, npc_types : List[str]):
+    """
+    Fills the (empty) map with random features, subs and NPCs.
+    """
+    for x in range(width):
+        for y in range(height):
+            if random.random() < features:
+                (attr, value) = random.choice(FEATURES)
+                get_square(x, y).add_attribute(attr, value)
+                if random.random() < 0.5:
+                    get_square(x, y).bury_treasure(random.choice(["plating", "specimen", "tool"]))
+    for i in range(subs):
+        sub = add_headless_sub(f"sub{i}", random.randrange(width), random.randrange(height), "powerful")
+        if sub is not None:
+            sub.upgrades.add_keyword("wearfree")
+            sub.power.power_systems(["engines", "engines", "scanners", "crane"])
+            sub.movement.set_direction(random.choice(possible_directions()))
+    for _ in range(npcs):
+        add_npc(random.choice(npc_types), random.randrange(width), random.randrange(height), None)
+
+def play_turn():
+    """
+    Does what the crews would do between ticks: turn, lower the crane and shoot.
+    """
+    for sub in get_sub_objects():
+        if random.random() < 0.1:
+            sub.movement.set_direction(random.choice(possible_directions()))
+        sub.inventory.drop_crane()
+        if random.random() < 0.2:
+            (x, y) = sub.movement.get_position()
+            sub.weapons.prepare_shot(False, x + random.randint(-3, 3), y + random.randint(-3, 3))
+
+async def run_ticks(ticks : int):
+    for counter in range(ticks):
+        play_turn()
+        await headless_tick(counter)
+
+def report(ticks : int, elapsed : float):
+    print(f"Ran {ticks} ticks in {elapsed:.3f}s ({ticks / elapsed:.1f} ticks/s).")
+    print("Timings (ms):")
+    print(tick_profiler.table(slowest=10))
+
+def main(argv : Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the ALTANTIS tick engine without Discord.")
+    parser.add_argument("--size", type=int, default=40, help="width and height of the map")
+    parser.add_argument("--subs", type=int, default=10, help="number of submarines")
+    parser.add_argument("--npcs", type=int, default=100, help="number of NPCs")
+    parser.add_argument("--npc-types", nargs="*", default=None, help="NPC types to choose from (default: all)")
+    parser.add_argument("--features", type=float, default=0.05, help="proportion of squares with an attribute")
+    parser.add_argument("--ticks", type=int, default=50, help="number of ticks to run")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    setup_start = time.perf_counter()
+    new_headless_game(args.size, args.size)
+    npc_types = args.npc_types or get_npc_types()
+    build_world(args.size, args.size, args.features, args.subs, args.npcs, npc_types)
+    print(f"Built a {args.size}x{args.size} world with {args.subs} subs and {args.npcs} NPCs in {time.perf_counter() - setup_start:.3f}s.")
+
+    tick_profiler.reset(args.ticks)
+    start = time.perf_counter()
+    asyncio.run(run_ticks(args.ticks))
+    report(args.ticks, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
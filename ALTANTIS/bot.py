@@ -6,7 +6,20 @@ perform and how to do so.
 from discord.ext import commands
 
 from ALTANTIS.utils.bot import bot
-from ALTANTIS.utils.consts import ADMIN_NAME, TOKEN
+from ALTANTIS.utils.consts import ADMIN_NAME, TOKEN, MAP_TOKEN, MAP_DOMAIN, RECOVER_ON_STARTUP
+from ALTANTIS.utils.journal import journal
+from ALTANTIS.game import recover_game
+
+@bot.event
+async def on_ready():
+    # on_ready fires again whenever we reconnect, but we only recover once.
+    if journal.enabled:
+        return
+    if RECOVER_ON_STARTUP:
+        await recover_game(bot)
+        journal.enable(False)
+    else:
+        journal.enable(True)
 
 @bot.event
 async def on_command_error(ctx, error):
@@ -50,6 +63,9 @@ bot.add_cog(UpgradeManagement())
 bot.add_cog(Weaponry())
 
 def run_bot():
+    assert TOKEN != ""
+    assert MAP_TOKEN != ""
+    assert MAP_DOMAIN != ""
     print("ALTANTIS READY")
     bot.run(TOKEN)
 
@@ -3,6 +3,7 @@ from discord.ext import commands
 from ALTANTIS.utils.consts import CONTROL_ROLE, CAPTAIN
 from ALTANTIS.utils.bot import perform, perform_async, perform_unsafe, perform_async_unsafe, get_team
 from ALTANTIS.utils.actions import DiscordAction, Message, OKAY_REACT, FAIL_REACT
+from ALTANTIS.utils.journal import journalled
 from ALTANTIS.subs.state import with_sub_async
 
 class Comms(commands.Cog):
@@ -32,6 +33,7 @@ async def shout_at_team(team : str, message : str) -> DiscordAction:
         return OKAY_REACT
     return await with_sub_async(team, do_shout, FAIL_REACT)
 
+@journalled
 async def broadcast(team : str, message : str) -> DiscordAction:
     async def do_broadcast(sub):
         if sub.power.activated():
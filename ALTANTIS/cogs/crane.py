@@ -3,6 +3,7 @@ from discord.ext import commands
 from ALTANTIS.utils.consts import CONTROL_ROLE, SCIENTIST
 from ALTANTIS.utils.bot import perform, get_team
 from ALTANTIS.utils.actions import DiscordAction, Message, FAIL_REACT
+from ALTANTIS.utils.journal import journalled
 from ALTANTIS.subs.state import with_sub
 
 class Crane(commands.Cog):
@@ -17,6 +18,7 @@ class Crane(commands.Cog):
         """
         await perform(drop_crane, ctx, get_team(ctx.channel))
 
+@journalled
 def drop_crane(team : str) -> DiscordAction:
     def do_crane(sub):
         return Message(sub.inventory.drop_crane())
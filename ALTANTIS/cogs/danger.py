@@ -3,6 +3,7 @@ from discord.ext import commands
 from ALTANTIS.utils.consts import CONTROL_ROLE, CAPTAIN
 from ALTANTIS.utils.bot import perform_async, perform_unsafe, perform_async_unsafe, get_team
 from ALTANTIS.utils.actions import DiscordAction, OKAY_REACT, FAIL_REACT, to_react
+from ALTANTIS.utils.journal import journalled
 from ALTANTIS.world.extras import explode
 from ALTANTIS.subs.state import with_sub_async, remove_team
 
@@ -38,6 +39,7 @@ class DangerZone(commands.Cog):
         """
         await perform_async_unsafe(explode_square, ctx, x, y, amount)
 
+@journalled
 async def kill_sub(team : str, verify : str) -> DiscordAction:
     async def do_kill(sub):
         if sub._name == verify:
@@ -47,10 +49,12 @@ async def kill_sub(team : str, verify : str) -> DiscordAction:
         return FAIL_REACT
     return await with_sub_async(team, do_kill, FAIL_REACT)
 
+@journalled
 def delete_team(team : str) -> DiscordAction:
     # DELETES THE TEAM IN QUESTION. DO NOT DO THIS UNLESS YOU ARE ABSOLUTELY CERTAIN.
     return to_react(remove_team(team))
 
+@journalled
 async def explode_square(x : int, y : int, power : int) -> DiscordAction:
     await explode((x, y), power)
     return OKAY_REACT
\ No newline at end of file
@@ -4,6 +4,7 @@ from ALTANTIS.utils.consts import CONTROL_ROLE, CAPTAIN, CURRENCY_NAME, RESOURCE
 from ALTANTIS.utils.bot import perform, perform_async, perform_async_unsafe, get_team, perform_unsafe
 from ALTANTIS.utils.actions import DiscordAction, Message, OKAY_REACT, FAIL_REACT
 from ALTANTIS.utils.text import to_pair_list
+from ALTANTIS.utils.journal import journalled
 from ALTANTIS.subs.state import with_sub, with_sub_async, get_sub
 from ALTANTIS.npcs.npc import interact_in_square
 
@@ -101,6 +102,7 @@ class Inventory(commands.Cog):
         """
         await perform_unsafe(list_resources, ctx)
 
+@journalled
 async def arrange_trade(team : str, partner : str, items) -> DiscordAction:
     pair_list = []
     try:
@@ -113,6 +115,7 @@ async def arrange_trade(team : str, partner : str, items) -> DiscordAction:
         return Message(await sub.inventory.begin_trade(partner_sub, pair_list))
     return Message("Didn't recognise the submarine asked for.")
 
+@journalled
 async def make_offer(team : str, items) -> DiscordAction:
     try:
         pair_list = to_pair_list(items)
@@ -124,16 +127,19 @@ async def make_offer(team : str, items) -> DiscordAction:
         return Message(await sub.inventory.make_offer(pair_list))
     return await with_sub_async(team, do_offer, FAIL_REACT)
 
+@journalled
 async def accept_offer(team : str) -> DiscordAction:
     async def do_accept(sub):
         return Message(await sub.inventory.accept_trade())
     return await with_sub_async(team, do_accept, FAIL_REACT)
 
+@journalled
 async def reject_offer(team : str) -> DiscordAction:
     async def do_reject(sub):
         return Message(await sub.inventory.reject_trade())
     return await with_sub_async(team, do_reject, FAIL_REACT)
 
+@journalled
 async def sub_interacts(team : str, arg) -> DiscordAction:
     async def do_interact(sub):
         message = await interact_in_square(sub, sub.movement.get_position(), arg)
@@ -142,6 +148,7 @@ async def sub_interacts(team : str, arg) -> DiscordAction:
         return Message("Nothing to report.")
     return await with_sub_async(team, do_interact, FAIL_REACT)
 
+@journalled
 async def give_item_to_team(team : str, item : str, quantity : int) -> DiscordAction:
     async def do_give(sub):
         if sub.inventory.add(item, quantity):
@@ -150,6 +157,7 @@ async def give_item_to_team(team : str, item : str, quantity : int) -> DiscordAc
         return FAIL_REACT
     return await with_sub_async(team, do_give, FAIL_REACT)
 
+@journalled
 async def take_item_from_team(team : str, item : str, quantity : int) -> DiscordAction:
     async def do_take(sub):
         if sub.inventory.remove(item, quantity):
@@ -158,6 +166,7 @@ async def take_item_from_team(team : str, item : str, quantity : int) -> Discord
         return FAIL_REACT
     return await with_sub_async(team, do_take, FAIL_REACT)
 
+@journalled
 def drop_item(team : str, item : str) -> DiscordAction:
     def drop(sub):
         return Message(sub.inventory.drop(item))
@@ -1,13 +1,16 @@
+import asyncio
 import discord
 from discord.ext import commands
 
 from ALTANTIS.utils.consts import CONTROL_ROLE
 from ALTANTIS.utils.bot import perform_unsafe, perform_async_unsafe, bot, main_loop
-from ALTANTIS.utils.actions import DiscordAction, OKAY_REACT, FAIL_REACT
+from ALTANTIS.utils.actions import DiscordAction, Message, OKAY_REACT, FAIL_REACT
+from ALTANTIS.utils.profiler import tick_profiler
 from ALTANTIS.utils.roles import create_or_return_role
 from ALTANTIS.utils.control import init_control_notifs, init_news_notifs
+from ALTANTIS.utils.journal import journalled
 from ALTANTIS.subs.state import add_team, get_sub
-from ALTANTIS.game import load_game, save_game
+from ALTANTIS.game import load_game, save_game, recover_game
 
 class GameManagement(commands.Cog):
     """
@@ -21,6 +24,15 @@ class GameManagement(commands.Cog):
         """
         await perform_unsafe(load_game, ctx, arg, offset, bot)
     
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def recover(self, ctx):
+        """
+        (CONTROL) Rebuilds the game as it was before the bot last went down, by loading the latest save and replaying every command and turn since then. This happens automatically when the bot starts if RECOVER_ON_STARTUP is set.
+        Stop the loop before running this, as it replaces the game that is running.
+        """
+        await perform_async_unsafe(recover_from_journal, ctx, bot)
+
     @commands.command()
     @commands.has_role(CONTROL_ROLE)
     async def save(self, ctx):
@@ -31,7 +43,8 @@ class GameManagement(commands.Cog):
         I will reemphasise this, however: PLEASE DO NOT USE THIS COMMAND UNLESS YOU KNOW WHAT YOU'RE DOING.
         It may protect you from running it at the same time as the main loop, but it won't protect you from stupidity.
         """
-        if save_game():
+        saved = asyncio.get_event_loop().create_future()
+        if save_game(saved.set_result) and await saved:
             await OKAY_REACT.do_status(ctx)
         else:
             await FAIL_REACT.do_status(ctx)
@@ -73,6 +86,14 @@ class GameManagement(commands.Cog):
         main_loop.stop()
         await OKAY_REACT.do_status(ctx)
     
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def tickstats(self, ctx):
+        """
+        (CONTROL) Shows how long each phase of recent turns took (median, 95th percentile, worst and median CPU time, in milliseconds), along with the slowest submarines and types of NPC. Use this to see what is using up the time between turns.
+        """
+        await perform_unsafe(tick_stats, ctx)
+
     @commands.command()
     @commands.has_role(CONTROL_ROLE)
     async def set_alerts_channel(self, ctx):
@@ -142,6 +163,7 @@ async def make_submarine(guild : discord.Guild, name : str, captain : discord.Me
     await category.create_voice_channel("submarine", overwrites=allow_control_and_one(submarine_role))
     return await register(category, x, y, keyword)
 
+@journalled
 async def register(category : discord.CategoryChannel, x : int, y : int, keyword : str) -> DiscordAction:
     """
     Registers a team, setting them up with everything they could need.
@@ -154,3 +176,11 @@ async def register(category : discord.CategoryChannel, x : int, y : int, keyword
             await sub.send_to_all(f"Channel registered for sub **{category.name.title()}**.")
             return OKAY_REACT
     return FAIL_REACT
+
+async def recover_from_journal(bot) -> DiscordAction:
+    if await recover_game(bot):
+        return OKAY_REACT
+    return FAIL_REACT
+
+def tick_stats() -> DiscordAction:
+    return Message(tick_profiler.report())
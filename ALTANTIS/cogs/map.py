@@ -1,12 +1,16 @@
+import os
+from typing import Dict, Tuple
+
+import numpy as np
 from discord.ext.commands.core import command
-from ALTANTIS.world.consts import WEATHER
 from discord.ext import commands
 
 from ALTANTIS.utils.consts import CONTROL_ROLE
 from ALTANTIS.utils.bot import perform_unsafe
 from ALTANTIS.utils.actions import DiscordAction, OKAY_REACT, FAIL_REACT
-from ALTANTIS.world.world import get_square, bury_treasure_at, unbury_treasure_at
-from ALTANTIS.world.consts import WEATHER
+from ALTANTIS.utils.journal import journalled
+from ALTANTIS.world.world import get_square, bury_treasure_at, unbury_treasure_at, paint_weather
+from ALTANTIS.world.consts import WEATHER, WEATHER_CODES, WEATHER_KEEP
 
 class MapModification(commands.Cog):
     """
@@ -53,42 +57,58 @@ class MapModification(commands.Cog):
         """
         await perform_unsafe(mass_weather, ctx, preset)
 
+@journalled
 def bury_treasure(name : str, x : int, y : int) -> DiscordAction:
     if bury_treasure_at(name, (x, y)):
         return OKAY_REACT
     return FAIL_REACT
 
+@journalled
 def unbury_treasure(name : str, x : int, y : int) -> DiscordAction:
     if unbury_treasure_at(name, (x, y)):
         return OKAY_REACT
     return FAIL_REACT
 
+@journalled
 def add_attribute_to(x : int, y : int, attribute : str, value) -> DiscordAction:
     square = get_square(x, y)
     if square and square.add_attribute(attribute, value):
         return OKAY_REACT
     return FAIL_REACT
 
+@journalled
 def remove_attribute_from(x : int, y : int, attribute : str) -> DiscordAction:
     square = get_square(x, y)
     if square and square.remove_attribute(attribute):
         return OKAY_REACT
     return FAIL_REACT
 
+# Weather presets we have already read, by file name, with when the file was
+# last modified (so edited presets are read again).
+weather_presets : Dict[str, Tuple[float, np.ndarray]] = {}
+
+def load_weather_preset(path : str) -> np.ndarray:
+    """
+    Reads a weather preset into weather codes (indexed [x, y]), with
+    characters that aren't weather marked WEATHER_KEEP.
+    """
+    modified = os.path.getmtime(path)
+    if path in weather_presets and weather_presets[path][0] == modified:
+        return weather_presets[path][1]
+    CHAR_TO_CODE = {WEATHER[k].lower(): WEATHER_CODES[k] for k in WEATHER}
+    with open(path) as f:
+        map_arr = f.read().split("\n")
+    codes = np.full((max(map(len, map_arr), default=0), len(map_arr)), WEATHER_KEEP, dtype=np.uint8)
+    for y in range(len(map_arr)):
+        for x in range(len(map_arr[y])):
+            codes[x, y] = CHAR_TO_CODE.get(map_arr[y][x].lower(), WEATHER_KEEP)
+    weather_presets[path] = (modified, codes)
+    return codes
+
+@journalled
 def mass_weather(preset : str):
-    CHAR_TO_WEATHER = {WEATHER[k].lower(): k.lower() for k in WEATHER}
     try:
-        with open(f"weather/{preset}.txt") as f:
-            # First, try to load the file.
-            map_arr = f.readlines()
-            for y in range(len(map_arr)):
-                for x in range(len(map_arr[y])):
-                    # Then for each square, set the weather accordingly.
-                    sq = get_square(x, y)
-                    if sq is not None:
-                        char = map_arr[y][x].lower()
-                        if char in CHAR_TO_WEATHER:
-                            sq.attributes["weather"] = CHAR_TO_WEATHER[char]
+        paint_weather(0, 0, load_weather_preset(f"weather/{preset}.txt"))
         return OKAY_REACT
     except:
         return FAIL_REACT
\ No newline at end of file
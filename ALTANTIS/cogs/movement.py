@@ -4,6 +4,7 @@ from discord.ext import commands
 from ALTANTIS.utils.consts import CONTROL_ROLE, CAPTAIN, direction_emoji
 from ALTANTIS.utils.bot import perform, perform_async, perform_unsafe, get_team
 from ALTANTIS.utils.actions import DiscordAction, Message, React, OKAY_REACT, FAIL_REACT
+from ALTANTIS.utils.journal import journalled
 from ALTANTIS.subs.state import with_sub, with_sub_async
 
 class Movement(commands.Cog):
@@ -18,6 +19,14 @@ class Movement(commands.Cog):
         """
         await perform(move, ctx, direction, get_team(ctx.channel))
 
+    @commands.command()
+    @commands.has_any_role(CAPTAIN, CONTROL_ROLE)
+    async def course(self, ctx, x : int, y : int):
+        """
+        Sets the autopilot to take your submarine to (<x>, <y>) by the quickest route, steering every turn until you get there or call !setdir.
+        """
+        await perform(set_course, ctx, x, y, get_team(ctx.channel))
+
     @commands.command()
     @commands.has_role(CONTROL_ROLE)
     async def teleport(self, ctx, x : int, y : int):
@@ -52,6 +61,7 @@ class Movement(commands.Cog):
         """
         await perform_async(exit_submarine, ctx, get_team(ctx.channel), ctx.guild)
 
+@journalled
 def move(direction : str, subname : str) -> DiscordAction:
     """
     Records the team's direction.
@@ -60,10 +70,26 @@ def move(direction : str, subname : str) -> DiscordAction:
     def do_move(sub):
         # Store the move and return the correct emoji.
         if sub.movement.set_direction(direction):
+            sub.movement.cancel_course()
             return React(direction_emoji[direction])
         return FAIL_REACT
     return with_sub(subname, do_move, FAIL_REACT)
 
+@journalled
+def set_course(x : int, y : int, subname : str) -> DiscordAction:
+    """
+    Sets the team's autopilot, if there is a route to (x, y).
+    """
+    def do_set_course(sub):
+        moves = sub.movement.set_course(x, y)
+        if moves is None:
+            return Message(f"There is no route from {sub.movement.get_position()} to {(x, y)}!")
+        if tuple(sub.movement.route[-1]) != (x, y):
+            return Message(f"Course set for {(x, y)}, which is too far to plan all at once, so the first {moves} moves are planned. Heading **{sub.movement.get_direction().upper()}**.")
+        return Message(f"Course set for {(x, y)}, {moves} moves away. Heading **{sub.movement.get_direction().upper()}**.")
+    return with_sub(subname, do_set_course, FAIL_REACT)
+
+@journalled
 def teleport(subname : str, x : int, y : int) -> DiscordAction:
     """
     Teleports team to (x,y), checking if the space is in the world.
@@ -74,6 +100,7 @@ def teleport(subname : str, x : int, y : int) -> DiscordAction:
         return FAIL_REACT
     return with_sub(subname, do_teleport, FAIL_REACT)
 
+@journalled
 async def set_activation(team : str, guild : discord.Guild, value : bool) -> DiscordAction:
     """
     Sets the submarine's power to `value`.
@@ -90,6 +117,7 @@ async def set_activation(team : str, guild : discord.Guild, value : bool) -> Dis
         return OKAY_REACT
     return await with_sub_async(team, do_set, FAIL_REACT)
 
+@journalled
 async def exit_submarine(team : str, guild : discord.Guild) -> DiscordAction:
     async def do_exit(sub):
         message = await sub.docking(guild)
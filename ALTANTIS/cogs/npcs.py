@@ -1,12 +1,14 @@
 from discord.ext import commands
-from typing import Optional
+from typing import Optional, List, Dict, Any
 
 from ALTANTIS.utils.consts import CONTROL_ROLE
 from ALTANTIS.utils.bot import perform_unsafe, get_team, perform_async_unsafe
 from ALTANTIS.utils.actions import DiscordAction, Message, OKAY_REACT, FAIL_REACT
 from ALTANTIS.utils.text import list_to_and_separated
+from ALTANTIS.utils.journal import journalled
 from ALTANTIS.subs.state import get_sub
 from ALTANTIS.npcs.npc import add_npc, get_npc, kill_npc, get_npc_types
+from ALTANTIS.npcs.population import spawn_population, spawn_populations, load_populations
 
 class NPCs(commands.Cog):
     """
@@ -20,6 +22,22 @@ class NPCs(commands.Cog):
         """
         await perform_unsafe(add_npc_to_map, ctx, npctype, x, y, get_team(ctx.channel))
     
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def spawn(self, ctx, npctype, count : int, *region : int):
+        """
+        (CONTROL) Adds <count> NPCs of <npctype> at random to squares they can enter, either anywhere or in the region <x0> <y0> <x1> <y1>.
+        """
+        await perform_unsafe(spawn_npcs, ctx, npctype, count, list(region), get_team(ctx.channel))
+
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def populate(self, ctx, name):
+        """
+        (CONTROL) Spawns all the populations in the file "/populations/<name>.json".
+        """
+        await perform_unsafe(populate_from_file, ctx, name)
+
     @commands.command()
     @commands.has_role(CONTROL_ROLE)
     async def remove_npc(self, ctx, npcid : int, rattle : bool = True):
@@ -44,12 +62,43 @@ class NPCs(commands.Cog):
         """
         await perform_unsafe(set_npc_health, ctx, npc, health)
 
+@journalled
 def add_npc_to_map(ntype : str, x : int, y : int, team : Optional[str]) -> DiscordAction:
     sub = None
     if team and get_sub(team):
         sub = team
     return Message(add_npc(ntype, x, y, sub))
 
+@journalled
+def spawn_npcs(ntype : str, count : int, region : List[int], team : Optional[str]) -> DiscordAction:
+    sub = None
+    if team and get_sub(team):
+        sub = team
+    population : Dict[str, Any] = {"type": ntype, "count": count}
+    if len(region) > 0:
+        population["region"] = region
+    return Message(spawn_population(population, sub))
+
+def populate_from_file(name : str) -> DiscordAction:
+    """
+    Reads the populations file here rather than when spawning, so that the
+    journal holds the populations themselves and replays the same spawns even
+    if the file has since changed.
+    """
+    if "/" in name or "\\" in name:
+        return Message("Population file names can't contain slashes.")
+    try:
+        populations = load_populations(f"populations/{name}.json")
+    except Exception as e:
+        print(e)
+        return FAIL_REACT
+    return spawn_population_list(populations)
+
+@journalled
+def spawn_population_list(populations : List[Dict[str, Any]]) -> DiscordAction:
+    return Message(spawn_populations(populations))
+
+@journalled
 async def remove_npc_from_map(npcid : int, rattle : bool) -> DiscordAction:
     if await kill_npc(npcid, rattle):
         return OKAY_REACT
@@ -59,6 +108,7 @@ def printout_npc_types() -> DiscordAction:
     types = list_to_and_separated(get_npc_types())
     return Message(f"Possible NPC types: {types}.")
 
+@journalled
 def set_npc_health(npcid : int, health : int) -> DiscordAction:
     if health <= 0:
         return FAIL_REACT
@@ -4,6 +4,7 @@ from typing import List
 from ALTANTIS.utils.consts import CONTROL_ROLE, ENGINEER
 from ALTANTIS.utils.bot import perform, perform_async, get_team
 from ALTANTIS.utils.actions import DiscordAction, Message, OKAY_REACT, FAIL_REACT
+from ALTANTIS.utils.journal import journalled
 from ALTANTIS.subs.state import with_sub, with_sub_async
 
 class PowerManagement(commands.Cog):
@@ -46,6 +47,7 @@ class PowerManagement(commands.Cog):
         """
         await perform_async(heal_up, ctx, get_team(ctx.channel), amount, reason)
 
+@journalled
 def power_systems(team : str, systems : List[str]) -> DiscordAction:
     """
     Powers `systems` of the submarine `team` if able.
@@ -55,6 +57,7 @@ def power_systems(team : str, systems : List[str]) -> DiscordAction:
         return Message(result)
     return with_sub(team, do_power, FAIL_REACT)
 
+@journalled
 def unpower_systems(team : str, systems : List[str]) -> DiscordAction:
     """
     Unpowers `systems` of the submarine `team` if able.
@@ -64,6 +67,7 @@ def unpower_systems(team : str, systems : List[str]) -> DiscordAction:
         return Message(result)
     return with_sub(team, do_unpower, FAIL_REACT)
 
+@journalled
 async def deal_damage(team : str, amount : int, reason : str) -> DiscordAction:
     async def do_damage(sub):
         sub.damage(amount)
@@ -71,6 +75,7 @@ async def deal_damage(team : str, amount : int, reason : str) -> DiscordAction:
         return OKAY_REACT
     return await with_sub_async(team, do_damage, FAIL_REACT)
 
+@journalled
 async def heal_up(team : str, amount : int, reason : str) -> DiscordAction:
     async def do_heal(sub):
         sub.power.heal(amount)
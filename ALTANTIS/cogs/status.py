@@ -1,17 +1,16 @@
-import json, httpx
 from discord.ext import commands
-from typing import List, Tuple, Dict, Any, Sequence
+from typing import Sequence
 
-from ALTANTIS.utils.consts import CONTROL_ROLE, CAPTAIN, MAP_DOMAIN, MAP_TOKEN, X_LIMIT, Y_LIMIT, SCIENTIST, ENGINEER
+from ALTANTIS.utils.consts import CONTROL_ROLE, CAPTAIN, SCIENTIST, ENGINEER, MAP_DOMAIN
+from ALTANTIS.utils.mapservice import map_service
 from ALTANTIS.utils.bot import perform, perform_async, perform_unsafe, perform_async_unsafe, get_team, main_loop
-from ALTANTIS.utils.actions import DiscordAction, Message, FAIL_REACT
-from ALTANTIS.utils.text import list_to_and_separated
-from ALTANTIS.utils.errors import SquareOutOfBoundsError
-from ALTANTIS.world.world import in_world, get_square
-from ALTANTIS.world.consts import MAX_OPTIONS
-from ALTANTIS.npcs.npc import filtered_npcs
-from ALTANTIS.subs.state import get_sub, get_sub_objects, filtered_teams, with_sub
-from ALTANTIS.subs.sub import Submarine
+from ALTANTIS.utils.actions import DiscordAction, Message, FileMessage, FAIL_REACT
+from ALTANTIS.world.world import in_world, get_square, current_tick, squares_with, squares_with_treasure
+from ALTANTIS.world.consts import MAX_OPTIONS, ATTRIBUTES
+from ALTANTIS.world.spatial import sub_index
+from ALTANTIS.world.render import draw_map, SUB_CHARS
+from ALTANTIS.world.mapimage import render_map_image, map_legend
+from ALTANTIS.subs.state import get_sub, get_sub_objects, with_sub
 
 class Status(commands.Cog):
     """
@@ -44,6 +43,14 @@ class Status(commands.Cog):
         """
         await perform_unsafe(zoom_in, ctx, x, y, main_loop)
 
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def find(self, ctx, what):
+        """
+        (CONTROL) Lists every square with the attribute <what>, or with treasure if <what> is "treasure".
+        """
+        await perform_unsafe(find_squares, ctx, what)
+
     @commands.command()
     @commands.has_any_role(CAPTAIN, ENGINEER, SCIENTIST, CONTROL_ROLE)
     async def status(self, ctx):
@@ -78,48 +85,25 @@ async def print_map(team: str, options: Sequence[str] = ("w", "d", "s", "a", "m"
         else:
             subs = [sub]
     map_string, map_arr = draw_map(subs, list(options), show_hidden)
-    map_json = json.dumps(map_arr)
-    async with httpx.AsyncClient() as client:
-        url = MAP_DOMAIN+"/api/map/"
-        res = await client.post(url, data={"map": map_string, "key": MAP_TOKEN, "names": map_json})
-        if res.status_code == 200:
-            final_url = MAP_DOMAIN+res.json()['url']
+    if MAP_DOMAIN != "":
+        final_url = await map_service.upload((team, tuple(options), show_hidden), current_tick(), map_string, map_arr)
+        if final_url is not None:
             return Message(f"The map is visible here: {final_url}")
-    return FAIL_REACT
-
-def draw_map(subs: List[Submarine], to_show: List[str], show_hidden: bool) -> Tuple[str, List[Dict[str, Any]]]:
-    """
-    Draws an ASCII version of the map.
-    Also returns a JSON of additional information.
-    `subs` is a list of submarines, which are marked 0-9 on the map.
-    """
-    SUB_CHARS = ['1','2','3','4','5','6','7','8','9','0','-','+','=']
-    map_string = ""
-    map_json = []
-    for y in range(Y_LIMIT):
-        row = ""
-        for x in range(X_LIMIT):
-            square = get_square(x, y)
-            if square is None:
-                raise SquareOutOfBoundsError((x, y))
-            tile_char = square.to_char(to_show, show_hidden, list(map(lambda sub: sub._name, subs)))
-            tile_name = square.map_name(to_show, show_hidden, list(map(lambda sub: sub._name, subs)))
-            if tile_name is not None:
-                map_json.append({"x": x, "y": y, "name": tile_name})
-            if "n" in to_show:
-                npcs_in_square = filtered_npcs(lambda n: n.x == x and n.y == y)
-                if len(npcs_in_square) > 0:
-                    tile_char = "N"
-                    npcs_str = list_to_and_separated(list(map(lambda n: n.name(), npcs_in_square)))
-                    map_json.append({"x": x, "y": y, "name": npcs_str})
-            for i in range(len(subs)):
-                (sx, sy) = subs[i].movement.get_position()
-                if sx == x and sy == y:
-                    tile_char = SUB_CHARS[i]
-                    map_json.append({"x": x, "y": y, "name": subs[i].name()})
-            row += tile_char
-        map_string += row + "\n"
-    return map_string, map_json
+    # No map service (or it's down), so draw the map ourselves.
+    try:
+        image = await render_map_image(map_string)
+    except Exception as e:
+        print(e)
+        return FAIL_REACT
+    files = [("map.png", image)]
+    legend = map_legend(map_arr)
+    if legend != "":
+        files.append(("map.txt", legend.encode("utf-8")))
+    key = ", ".join(f"**{SUB_CHARS[i]}**: {subs[i].name()}" for i in range(len(subs)))
+    if len(key) > 1800:
+        # Too long for a Discord message.
+        return FileMessage("Here is the map:", files)
+    return FileMessage(f"Here is the map ({key}):", files)
 
 def zoom_in(x : int, y : int, loop) -> DiscordAction:
     if in_world(x, y):
@@ -127,12 +111,38 @@ def zoom_in(x : int, y : int, loop) -> DiscordAction:
         # since in_world => get_square : Cell (not None)
         report += get_square(x, y).square_status() + "\n\n" # type: ignore
         # See if any subs are here, and if so print their status.
-        subs_in_square = filtered_teams(lambda sub: sub.movement.x == x and sub.movement.y == y)
+        subs_in_square = sub_index.at((x, y))
         for sub in subs_in_square:
             report += sub.status_message(loop) + "\n\n"
         return Message(report)
     return Message("Chosen square is outside the world boundaries!")
 
+def find_squares(what : str) -> DiscordAction:
+    if what == "treasure":
+        squares = squares_with_treasure()
+    elif what in ATTRIBUTES:
+        squares = squares_with(what)
+    else:
+        return Message(f"Can only find treasure or one of the attributes {', '.join(ATTRIBUTES)}.")
+    if len(squares) == 0:
+        return Message(f"No squares have {what}.")
+    report = f"Squares with {what}:\n"
+    for i in range(len(squares)):
+        (x, y) = squares[i]
+        square = get_square(x, y)
+        if what == "treasure":
+            line = f"**({x}, {y})**: {square.treasure_string()}\n"
+        elif square.attributes[what] != "":
+            line = f"**({x}, {y})**: {square.attributes[what]}\n"
+        else:
+            line = f"**({x}, {y})**\n"
+        if len(report) + len(line) > 1900:
+            # Too long for a Discord message.
+            report += f"...and {len(squares) - i} more."
+            break
+        report += line
+    return Message(report)
+
 def get_status(team : str, loop) -> DiscordAction:
     def do_status(sub):
         status_message = sub.status_message(loop)
@@ -6,6 +6,7 @@ from discord.ext.commands.core import command
 from ALTANTIS.utils.consts import CONTROL_ROLE
 from ALTANTIS.utils.bot import perform_async_unsafe, get_team, perform_unsafe
 from ALTANTIS.utils.actions import DiscordAction, OKAY_REACT, FAIL_REACT, Message
+from ALTANTIS.utils.journal import journalled
 from ALTANTIS.subs.state import with_sub_async
 from ALTANTIS.subs.subsystems.upgrades import VALID_UPGRADES
 
@@ -72,6 +73,7 @@ class UpgradeManagement(commands.Cog):
         """
         await perform_unsafe(list_keywords, ctx)
 
+@journalled
 async def upgrade_sub(team : str, amount : int) -> DiscordAction:
     async def do_upgrade(sub):
         sub.power.modify_reactor(amount)
@@ -79,6 +81,7 @@ async def upgrade_sub(team : str, amount : int) -> DiscordAction:
         return OKAY_REACT
     return await with_sub_async(team, do_upgrade, FAIL_REACT)
 
+@journalled
 async def upgrade_sub_system(team : str, system : str, amount : int) -> DiscordAction:
     async def do_upgrade(sub):
         if sub.power.modify_system(system, amount):
@@ -87,6 +90,7 @@ async def upgrade_sub_system(team : str, system : str, amount : int) -> DiscordA
         return FAIL_REACT
     return await with_sub_async(team, do_upgrade, FAIL_REACT)
 
+@journalled
 async def upgrade_sub_innate(team : str, system : str, amount : int) -> DiscordAction:
     async def do_upgrade(sub):
         if sub.power.modify_innate_system(system, amount):
@@ -95,6 +99,7 @@ async def upgrade_sub_innate(team : str, system : str, amount : int) -> DiscordA
         return FAIL_REACT
     return await with_sub_async(team, do_upgrade, FAIL_REACT)
 
+@journalled
 async def add_system(team : str, system : str) -> DiscordAction:
     async def do_add(sub):
         if sub.power.add_system(system):
@@ -103,6 +108,7 @@ async def add_system(team : str, system : str) -> DiscordAction:
         return FAIL_REACT
     return await with_sub_async(team, do_add, FAIL_REACT)
 
+@journalled
 async def add_keyword_to_sub(team : str, keyword : str, turn_limit : Optional[int], damage : int) -> DiscordAction:
     async def do_add(sub):
         message = sub.upgrades.add_keyword(keyword, turn_limit, damage)
@@ -112,6 +118,7 @@ async def add_keyword_to_sub(team : str, keyword : str, turn_limit : Optional[in
         return FAIL_REACT
     return await with_sub_async(team, do_add, FAIL_REACT)
 
+@journalled
 async def remove_keyword_from_sub(team : str, keyword : str) -> DiscordAction:
     async def do_remove(sub):
         if sub.upgrades.remove_keyword(keyword):
@@ -3,6 +3,7 @@ from discord.ext import commands
 from ALTANTIS.utils.consts import CONTROL_ROLE, SCIENTIST
 from ALTANTIS.utils.bot import perform, get_team
 from ALTANTIS.utils.actions import Message, FAIL_REACT
+from ALTANTIS.utils.journal import journalled
 from ALTANTIS.subs.state import with_sub
 
 class Weaponry(commands.Cog):
@@ -26,6 +27,7 @@ class Weaponry(commands.Cog):
         """
         await perform(schedule_shot, ctx, x, y, get_team(ctx.channel), False)
 
+@journalled
 def schedule_shot(x : int, y : int, team : str, damaging : bool):
     def do_schedule(sub):
         return Message(sub.weapons.prepare_shot(damaging, x, y))
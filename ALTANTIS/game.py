@@ -8,172 +8,292 @@ from ALTANTIS.npcs.npc import npc_tick, npcs_to_json, npcs_from_json
 from ALTANTIS.world.world import map_tick, map_to_dict, map_from_dict
 from ALTANTIS.utils.actions import FAIL_REACT, OKAY_REACT
 from ALTANTIS.utils.emergencies import emergencies
+from ALTANTIS.utils.profiler import tick_profiler
+from ALTANTIS.utils.store import write_snapshot, save_index, read_manifest, get_map, get_state, get_npcs
+from ALTANTIS.utils.journal import journal, replay_call
+from ALTANTIS.utils.outbox import outbox
 
-import json, datetime, os, gzip, random
-from typing import List, Dict
+import random, marshal, time, asyncio
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Tuple, Callable, Awaitable, Any, Optional
 
 NO_SAVE = False
+# Saves are written by a single background thread, so they finish in order.
+save_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="save")
 
-async def perform_timestep(counter : int):
+class Turn():
     """
-    Does all time-related stuff, including movement, power changes and so on.
-    Called at a time interval, when allowed.
+    Everything the phases of a single tick share: the turn number, which subs
+    are active and the messages collected so far for each sub.
     """
-    global NO_SAVE
-    NO_SAVE = True
+    def __init__(self, counter : int):
+        self.counter = counter
+        # Get all active subs. (Can you tell I'm a functional programmer?)
+        # Note: we still collect all messages for all subs, as there are some
+        # messages that inactive subs should receive.
+        self.active_subs : List[Submarine] = list(filter(lambda sub: sub.power.activated(), get_sub_objects()))
+        self.messages : Dict[str, Dict[str, str]] = {i: {"engineer": "", "captain": "", "scientist": ""} for i in get_subs()}
 
-    print(f"Running turn {counter}.")
+    def add_message(self, subname : str, channels : List[str], message : str):
+        for channel in channels:
+            self.messages[subname][channel] += message
+
+async def emergency_phase(turn : Turn):
+    for sub in turn.active_subs:
+        with tick_profiler.sub(sub._name):
+            if sub.power.total_power == 1:
+                emergency_message = f"**EMERGENCY!!!** {random.choice(emergencies)}\n"
+                turn.add_message(sub._name, ["captain", "scientist", "engineer"], emergency_message)
 
-    def is_active_sub(sub):
-        return sub.power.activated()
-
-    # Get all active subs. (Can you tell I'm a functional programmer?)
-    # Note: we still collect all messages for all subs, as there are some
-    # messages that inactive subs should receive.
-    subsubset : List[Submarine] = list(filter(is_active_sub, get_sub_objects()))
-    submessages : Dict[str, Dict[str, str]] = {i: {"engineer": "", "captain": "", "scientist": ""} for i in get_subs()}
-    message_opening : str = f"---------**TURN {counter}**----------\n"
-
-    # Emergency messaging
-    for sub in subsubset:
-        if sub.power.total_power == 1:
-            subname = sub._name
-            emergency_message = f"**EMERGENCY!!!** {random.choice(emergencies)}\n"
-            submessages[subname]["captain"] += emergency_message
-            submessages[subname]["scientist"] += emergency_message
-            submessages[subname]["engineer"] += emergency_message
-
-    # Power management
-    for sub in subsubset:
-        power_message = sub.power.apply_power_schedule()
-        if power_message:
-            subname = sub._name
-            power_message = f"{power_message}\n"
-            submessages[subname]["captain"] += power_message
-            submessages[subname]["engineer"] += power_message
-
-    # Weapons
-    for sub in subsubset:
-        weapons_message = sub.weapons.weaponry_tick()
-        if weapons_message:
-            weapons_message = f"{weapons_message}\n"
-            submessages[sub._name]["captain"] += weapons_message
-    
-    # NPCs
+async def power_phase(turn : Turn):
+    for sub in turn.active_subs:
+        with tick_profiler.sub(sub._name):
+            power_message = sub.power.apply_power_schedule()
+            if power_message:
+                turn.add_message(sub._name, ["captain", "engineer"], f"{power_message}\n")
+
+async def weapons_phase(turn : Turn):
+    for sub in turn.active_subs:
+        with tick_profiler.sub(sub._name):
+            weapons_message = sub.weapons.weaponry_tick()
+            if weapons_message:
+                turn.add_message(sub._name, ["captain"], f"{weapons_message}\n")
+
+async def npc_phase(turn : Turn):
     await npc_tick()
-    # Map
+
+async def map_phase(turn : Turn):
     map_tick()
 
-    # The crane
-    for sub in subsubset:
-        crane_message = await sub.inventory.crane_tick()
-        if crane_message:
-            crane_message = f"{crane_message}\n"
-            submessages[sub._name]["scientist"] += crane_message
+async def crane_phase(turn : Turn):
+    for sub in turn.active_subs:
+        with tick_profiler.sub(sub._name):
+            crane_message = await sub.inventory.crane_tick()
+            if crane_message:
+                turn.add_message(sub._name, ["scientist"], f"{crane_message}\n")
 
+async def movement_phase(turn : Turn):
     # Movement, trade and puzzles
-    for sub in subsubset:
-        move_message, trade_messages = await sub.movement.movement_tick()
-        if move_message:
-            move_message = f"{move_message}\n"
-            submessages[sub._name]["captain"] += move_message
-        for target in trade_messages:
-            submessages[target]["captain"] += trade_messages[target] + "\n"
-    
-    # Scanning (as we enter a new square only)
-    for sub in subsubset:
-        scan_message = sub.scan.scan_string()
-        if scan_message != "":
-            subname = sub._name
-            submessages[subname]["captain"] += scan_message
-            submessages[subname]["scientist"] += scan_message
-    
-    # Postponed events
-    for sub in subsubset:
-        await sub.upgrades.postponed_tick()
-
-    # Damage
+    for sub in turn.active_subs:
+        with tick_profiler.sub(sub._name):
+            move_message, trade_messages = await sub.movement.movement_tick()
+            if move_message:
+                turn.add_message(sub._name, ["captain"], f"{move_message}\n")
+            for target in trade_messages:
+                turn.add_message(target, ["captain"], trade_messages[target] + "\n")
+
+async def scan_phase(turn : Turn):
+    # Scanning (the squares part of which is cached, see scan.square_events)
+    for sub in turn.active_subs:
+        with tick_profiler.sub(sub._name):
+            scan_message = sub.scan.scan_string()
+            if scan_message != "":
+                turn.add_message(sub._name, ["captain", "scientist"], scan_message)
+
+async def postponed_phase(turn : Turn):
+    for sub in turn.active_subs:
+        with tick_profiler.sub(sub._name):
+            await sub.upgrades.postponed_tick()
+
+async def damage_phase(turn : Turn):
     for sub in get_sub_objects():
-        damage_message = await sub.power.damage_tick()
-        if damage_message:
-            subname = sub._name
-            damage_message = f"{damage_message}\n"
-            submessages[subname]["captain"] += damage_message
-            submessages[subname]["engineer"] += damage_message
-            submessages[subname]["scientist"] += damage_message
+        with tick_profiler.sub(sub._name):
+            damage_message = await sub.power.damage_tick()
+            if damage_message:
+                turn.add_message(sub._name, ["captain", "engineer", "scientist"], f"{damage_message}\n")
 
+async def message_phase(turn : Turn):
+    message_opening : str = f"---------**TURN {turn.counter}**----------\n"
+    active_names = list(map(lambda s: s._name, turn.active_subs))
     for sub in get_sub_objects():
-        messages = submessages[sub._name]
-        if messages["captain"] == "":
-            if sub._name not in map(lambda s: s._name, subsubset):
-                if sub.power.total_power <= 0:
-                    messages["captain"] = "Your submarine is **dead** so nothing happened.\n"
+        with tick_profiler.sub(sub._name):
+            messages = turn.messages[sub._name]
+            if messages["captain"] == "":
+                if sub._name not in active_names:
+                    if sub.power.total_power <= 0:
+                        messages["captain"] = "Your submarine is **dead** so nothing happened.\n"
+                    else:
+                        messages["captain"] = "Your submarine is deactivated so nothing happened.\n"
                 else:
-                    messages["captain"] = "Your submarine is deactivated so nothing happened.\n"
-            else:
-                messages["captain"] = "Your submarine is active, but there is nothing to notify you about.\n"
-        await sub.send_message(f"{message_opening}{messages['captain'][:-1]}", "captain")
-        if messages["engineer"] != "":
-            await sub.send_message(f"{message_opening}{messages['engineer'][:-1]}", "engineer")
-        if messages["scientist"] != "":
-            await sub.send_message(f"{message_opening}{messages['scientist'][:-1]}", "scientist")
+                    messages["captain"] = "Your submarine is active, but there is nothing to notify you about.\n"
+            await sub.send_message(f"{message_opening}{messages['captain'][:-1]}", "captain")
+            if messages["engineer"] != "":
+                await sub.send_message(f"{message_opening}{messages['engineer'][:-1]}", "engineer")
+            if messages["scientist"] != "":
+                await sub.send_message(f"{message_opening}{messages['scientist'][:-1]}", "scientist")
+
+# The phases of a tick, in the order they are run.
+TICK_PHASES : List[Tuple[str, Callable[[Turn], Awaitable[None]]]] = [
+    ("emergencies", emergency_phase),
+    ("power", power_phase),
+    ("weapons", weapons_phase),
+    ("npcs", npc_phase),
+    ("map", map_phase),
+    ("crane", crane_phase),
+    ("movement", movement_phase),
+    ("scan", scan_phase),
+    ("postponed", postponed_phase),
+    ("damage", damage_phase),
+    ("messages", message_phase)
+]
+
+async def run_turn(counter : int) -> Dict[str, float]:
+    """
+    Runs every phase of a tick, returning how long (in seconds) each took.
+    Timings are also kept by tick_profiler (see !tickstats).
+    This doesn't touch Discord or the saves directly, so can be run headlessly.
+    """
+    turn = Turn(counter)
+    tick_profiler.start_tick()
+    for (name, phase) in TICK_PHASES:
+        with tick_profiler.phase(name):
+            await phase(turn)
+    return tick_profiler.end_tick()
+
+async def perform_timestep(counter : int):
+    """
+    Does all time-related stuff, including movement, power changes and so on.
+    Called at a time interval, when allowed.
+    """
+    global NO_SAVE
+    NO_SAVE = True
+
+    print(f"Running turn {counter}.")
+    journal.record_tick(counter)
+    await run_turn(counter)
 
     NO_SAVE = False
-    save_game()
+    save_game(tick=counter)
 
-def save_game():
+def snapshot(data : Any) -> Any:
     """
-    Save the game to map.json, state.json and npcs.json.
+    Deep copies plain data (dicts, lists, strings, numbers and so on).
+    Round-tripping through marshal is much faster than copy.deepcopy.
+    """
+    return marshal.loads(marshal.dumps(data))
+
+def write_save(tick : Optional[int], journal_seq : int, state_dict : Dict[str, Any], map_dict : Dict[str, Any], npcs_dict : Dict[str, Any]) -> Tuple[bool, float, float]:
+    """
+    Encodes, compresses and writes a snapshot taken by save_game into the
+    chunk store (see utils/store.py). This runs on the save thread, so must not
+    touch any live game state.
+    Returns whether it succeeded, along with the wall and CPU time taken.
+    """
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    success = True
+    try:
+        write_snapshot(tick, journal_seq, state_dict, map_dict, npcs_dict)
+    except Exception as e:
+        print(e)
+        success = False
+    return (success, time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+
+def save_game(on_complete : Optional[Callable[[bool], Any]] = None, tick : Optional[int] = None) -> bool:
+    """
+    Save the game (the map, state and npcs) along with the tick it was taken
+    after, if any.
     We save the map and state separately, so they can be loaded separately.
     This must be called at the end of the loop, as to guarantee that we're
     not about to overwrite important data being written during it.
+    Only taking the snapshot happens here - it is written out on the save
+    thread, after which on_complete is called (on the event loop) with whether
+    the save worked. Returns whether the save was started.
+    The save records how far through the journal it is, so recovery knows
+    what to replay on top of it.
     """
     try:
         if NO_SAVE:
             print("SAVE FAILED")
             return False
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        state_dict = state_to_dict()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        # map_to_dict already builds a fresh copy, but subs and NPCs share
+        # their lists and dicts with the live game.
+        state_dict = snapshot(state_to_dict())
         map_dict = map_to_dict()
-        npcs_dict = npcs_to_json()
-        # Write a new save at this timestamp.
-        with gzip.open(f"saves/state/{timestamp}.json.gz", "wt") as state_file:
-            json.dump(state_dict, state_file)
-        with gzip.open(f"saves/map/{timestamp}.json.gz", "wt") as map_file:
-            json.dump(map_dict, map_file)
-        with gzip.open(f"saves/npc/{timestamp}.json.gz", "wt") as npcs_file:
-            json.dump(npcs_dict, npcs_file)
-        return True
+        npcs_dict = snapshot(npcs_to_json())
+        journal_seq = journal.seq
+        tick_profiler.add_sample("save", "snapshot", time.perf_counter() - wall_start, time.thread_time() - cpu_start)
     except Exception as e:
         print(e)
+        return False
+
+    loop = asyncio.get_event_loop()
+    def finished(done : Future):
+        # If write_save itself blew up, treat it as a failed save - on_complete
+        # must always be called, or whoever is waiting on it waits forever.
+        success = False
+        if done.exception() is not None:
+            print(done.exception())
+        else:
+            (success, wall, cpu) = done.result()
+            tick_profiler.add_sample("save", "write", wall, cpu)
+        if on_complete is not None:
+            on_complete(success)
+    future = save_executor.submit(write_save, tick, journal_seq, state_dict, map_dict, npcs_dict)
+    future.add_done_callback(lambda done: loop.call_soon_threadsafe(finished, done))
+    return True
+
+def load_save(which : str, entry : Dict[str, Any], bot):
+    manifest = read_manifest(entry)
+    if which in ["all", "map"]:
+        map_from_dict(get_map(manifest["map"]))
+    if which in ["all", "state"]:
+        state_from_dict(get_state(manifest["state"]), bot)
+    if which in ["all", "npcs"]:
+        npcs_from_json(get_npcs(manifest["npcs"]))
 
 def load_game(which : str, offset : int, bot):
     """
-    Loads the state (from state.json), map (from map.json), npcs (from npcs.json) or all.
-    Does not check whether the files exist.
+    Loads the state, map, npcs or all from a save.
+    offset is how many saves to go back, where 0 is the latest.
     This is destructive, so needs the exact correct argument.
     """
-    # Get the relevant timestamp. We arbitrarily choose map to find the correct name.
-    prefix = f"{os.curdir}/saves"
-    filenames = sorted(os.listdir(f"{prefix}/map/"), reverse=True)
-    if offset >= len(filenames):
-        return FAIL_REACT
-    filename = filenames[offset]
     if which not in ["all", "map", "npcs", "state"]:
         return FAIL_REACT
-    if which in ["all", "map"]:
-        with gzip.open(f"{prefix}/map/{filename}", "r") as map_file:
-            map_string = map_file.read()
-            map_json = json.loads(map_string)
-            map_from_dict(map_json)
-    if which in ["all", "state"]:
-        with gzip.open(f"{prefix}/state/{filename}", "r") as state_file:
-            state_string = state_file.read()
-            state_json = json.loads(state_string)
-            state_from_dict(state_json, bot)
-    if which in ["all", "npcs"]:
-        with gzip.open(f"{prefix}/npc/{filename}", "r") as npc_file:
-            npc_string = npc_file.read()
-            npc_json = json.loads(npc_string)
-            npcs_from_json(npc_json)
-    return OKAY_REACT
\ No newline at end of file
+    entry = save_index.get(offset)
+    if entry is None:
+        return FAIL_REACT
+    journal.record_load(which, entry["generation"])
+    load_save(which, entry, bot)
+    return OKAY_REACT
+
+async def recover_game(bot) -> bool:
+    """
+    Rebuilds the game as it was before a crash: loads the latest save, and
+    then replays everything journalled since it was taken (with no messages
+    sent). Finishes with a fresh save, so the replay needn't happen again.
+    """
+    latest = save_index.get(0)
+    entries = journal.entries_after(latest["journal"] if latest else 0)
+    if len(entries) > 0 and entries[0]["type"] == "start":
+        # The game was started afresh after the latest save.
+        entries = entries[1:]
+    elif latest is not None:
+        load_save("all", latest, bot)
+    print(f"Recovering: replaying {len(entries)} journal entries.")
+    outbox.muted = True
+    journal.replaying = True
+    try:
+        for entry in entries:
+            try:
+                if entry["type"] == "tick":
+                    random.seed(entry["seed"])
+                    await run_turn(entry["counter"])
+                elif entry["type"] == "load":
+                    saved = save_index.by_generation(entry["generation"])
+                    if saved is not None:
+                        load_save(entry["which"], saved, bot)
+                elif entry["type"] == "call":
+                    await replay_call(entry, bot)
+            except Exception as e:
+                print(e)
+    finally:
+        outbox.muted = False
+        journal.replaying = False
+    # The save includes everything replayed, so must say so (journalling
+    # isn't enabled yet, so journal.seq hasn't been read), or recovering
+    # from it would replay it all again.
+    journal.load_seq()
+    return save_game()
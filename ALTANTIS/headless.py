@@ -0,0 +1,76 @@
+"""
+Runs the game without Discord. Every message the game would send to a channel
+is kept in an in-memory sink instead, so ticks can be driven by hand (say, by
+the benchmark in ALTANTIS/bench.py).
+"""
+
+from ALTANTIS.game import run_turn
+from ALTANTIS.subs.state import add_team, get_sub, state_from_dict
+from ALTANTIS.subs.sub import Submarine
+from ALTANTIS.npcs.npc import load_npc_types, npcs_from_json
+from ALTANTIS.world.world import new_map
+from ALTANTIS.utils.control import init_control_notifs, init_news_notifs
+from ALTANTIS.utils.outbox import outbox
+
+from typing import Dict, List, Optional, Any
+
+class MessageSink():
+    """
+    Stands in for a discord.TextChannel, keeping everything sent to it.
+    """
+    next_id = 0
+
+    def __init__(self, name : str):
+        self.name = name
+        self.id = MessageSink.next_id
+        MessageSink.next_id += 1
+        self.messages : List[str] = []
+
+    async def send(self, content : str, file : Any = None):
+        self.messages.append(content)
+
+class SinkCategory():
+    """
+    Stands in for the discord.CategoryChannel that a team is registered with.
+    """
+    def __init__(self, name : str):
+        self.name = name
+        self.text_channels = [MessageSink(channel) for channel in ["captain", "engineer", "scientist"]]
+
+# Where control and news alerts end up.
+control_sink = MessageSink("control-alerts")
+news_sink = MessageSink("news")
+
+def new_headless_game(x_limit : int, y_limit : int):
+    """
+    Throws away any current game, and starts an empty one on a map of the
+    given size with alerts going to control_sink and news_sink. Sinks aren't
+    rate limited.
+    """
+    outbox.set_rate_limit(0, 0)
+    load_npc_types()
+    new_map(x_limit, y_limit)
+    state_from_dict({}, None)
+    npcs_from_json({"npcs": [], "counter": 0})
+    init_control_notifs(control_sink)
+    init_news_notifs(news_sink)
+
+def add_headless_sub(name : str, x : int, y : int, keyword : str = "") -> Optional[Submarine]:
+    """
+    Registers a sub whose channels are message sinks, and activates it.
+    """
+    if not add_team(name, SinkCategory(name), x, y, keyword):
+        return None
+    sub = get_sub(name)
+    if sub is not None:
+        sub.power.activate(True)
+    return sub
+
+async def headless_tick(counter : int) -> Dict[str, float]:
+    """
+    Runs one tick, without saving, and waits for its messages to reach their
+    sinks. Returns the time taken by each phase.
+    """
+    phases = await run_turn(counter)
+    await outbox.drain()
+    return phases
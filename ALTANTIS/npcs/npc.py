@@ -4,21 +4,44 @@ Deals with NPCs in general, and how they operate.
 (Individual NPCs will be put elsewhere.)
 """
 
-from ALTANTIS.subs.state import filtered_teams, get_sub
+import heapq, operator, sys
+
+from ALTANTIS.subs.state import get_sub
 from ALTANTIS.subs.sub import Submarine
-from ALTANTIS.world.world import bury_treasure_at, in_world, get_square
+from ALTANTIS.world.world import bury_treasure_at, in_world, get_square, current_tick
 from ALTANTIS.world.extras import all_in_submap
+from ALTANTIS.world.spatial import sub_index, npc_index
+from ALTANTIS.world.flowfield import flow_field
+from ALTANTIS.utils.consts import NPC_REDUCED_MARGIN
 from ALTANTIS.utils.control import notify_control
 from ALTANTIS.utils.entity import Entity
-from ALTANTIS.utils.direction import diagonal_distance, determine_direction, go_in_direction, rotate_direction
+from ALTANTIS.utils.profiler import tick_profiler
+from ALTANTIS.utils.direction import diagonal_distance
 
-from typing import Tuple, List, Callable, Dict, Any, Optional, Union
+from typing import Tuple, List, Callable, Dict, Any, Optional, Set, Sequence, Iterable
 
 class NPC(Entity):
+    """
+    There can be thousands of NPCs, so they keep their fields in __slots__
+    rather than a __dict__ each. Every subclass that adds fields must list
+    them in its own __slots__ (and every other subclass needs an empty one),
+    as together these are what is saved (see schema and npcs_to_json), and
+    must set them all in __init__.
+    """
+    __slots__ = ("health", "treasure", "x", "y", "id", "stealth", "damage_to_apply",
+                 "camo", "observant", "photo", "typename", "parent", "last_tick")
+    # Fields whose strings are shared by many NPCs, so are interned. Treasure
+    # is shared too (see shared_treasure).
+    INTERNED = ("photo", "typename", "parent")
     classname = ""
+    # How close a sub has to be for this NPC's on_tick to do anything other
+    # than count turns, or None if it always might (say, because it changes
+    # the map). Further away, it only does reduced_tick, or nothing at all.
+    activity_radius : Optional[int] = 0
     def __init__(self, id : int, x : int, y : int):
         self.health = 1
-        self.treasure : List[str] = []
+        # Made into a shared tuple once the NPC is set up (see add_npc).
+        self.treasure : Sequence[str] = []
         self.x = x
         self.y = y
         self.id = id
@@ -27,8 +50,66 @@ class NPC(Entity):
         self.camo = False
         self.observant = False
         self.photo = ""
-        self.typename = self.classname.title()
+        self.typename = sys.intern(self.classname.title())
         self.parent : Optional[str] = None
+        # The last turn this NPC ticked (or caught up to). Older saves won't
+        # have it.
+        self.last_tick : Optional[int] = None
+
+    @classmethod
+    def schema(cls) -> Tuple[str, ...]:
+        """
+        The fields an NPC of this class has, which are what it saves.
+        """
+        if cls not in schemas:
+            fields : List[str] = []
+            for klass in reversed(cls.__mro__):
+                for field in klass.__dict__.get("__slots__", ()):
+                    if field not in fields:
+                        fields.append(field)
+            schemas[cls] = tuple(fields)
+            getters[cls] = operator.attrgetter(*fields)
+        return schemas[cls]
+
+    def to_row(self) -> Tuple[Any, ...]:
+        """
+        The values of this NPC's fields, in the order of its schema.
+        """
+        self.schema()
+        return getters[type(self)](self)
+
+    @classmethod
+    def loader(cls, fields : Tuple[str, ...]) -> List[Tuple[Any, Optional[Callable[[Any], Any]]]]:
+        """
+        How to set each of the given saved fields: the setter of its slot
+        (or None for fields this class no longer has) and how to convert its
+        saved value, if it needs to be.
+        """
+        key = (cls, fields)
+        if key not in loaders:
+            schema = cls.schema()
+            plan : List[Tuple[Any, Optional[Callable[[Any], Any]]]] = []
+            for field in fields:
+                setter = None
+                if field in schema:
+                    # The slot's descriptor, found on whichever class made it.
+                    setter = getattr(cls, field).__set__
+                convert : Optional[Callable[[Any], Any]] = None
+                if field in cls.INTERNED:
+                    convert = intern_string
+                elif field == "treasure":
+                    convert = shared_treasure
+                plan.append((setter, convert))
+            loaders[key] = plan
+        return loaders[key]
+
+    def load_fields(self, fields : Tuple[str, ...], values : Sequence[Any]):
+        """
+        Sets saved fields, ignoring any this class no longer has.
+        """
+        for ((setter, convert), value) in zip(self.loader(fields), values):
+            if setter is not None:
+                setter(self, value if convert is None else convert(value))
     
     async def on_tick(self):
         await self.damage_tick()
@@ -37,6 +118,34 @@ class NPC(Entity):
     async def attack(self):
         pass
 
+    def reduced_tick(self):
+        """
+        Does what on_tick would, given no sub is within activity_radius.
+        """
+        self.catch_up(1)
+
+    def catch_up(self, ticks : int):
+        """
+        Catches up on some turns spent dormant, which for most NPCs means
+        counting them.
+        """
+        pass
+
+    def count_ticks(self, threshold : int, ticks : int):
+        """
+        Counts turns in tick_count, which goes up to threshold and then back
+        to zero (as attacks that happen every few turns count them), so
+        repeats every threshold+1 turns.
+        """
+        while ticks > 0 and self.tick_count > threshold:
+            self.tick_count -= threshold
+            ticks -= 1
+        for _ in range(ticks % (threshold + 1)):
+            if self.tick_count >= threshold:
+                self.tick_count -= threshold
+            else:
+                self.tick_count += 1
+
     async def do_attack(self, entity, amount, message) -> bool:
         if self.attackable(entity):
             await entity.send_message(message, "scientist")
@@ -82,6 +191,8 @@ class NPC(Entity):
 
     def damage(self, amount : int):
         self.damage_to_apply += amount
+        # Wakes up (if dormant) to take it.
+        damaged.add(self.id)
     
     def outward_broadcast(self, strength : int) -> str:
         if strength >= self.stealth:
@@ -93,32 +204,18 @@ class NPC(Entity):
         if sq is not None and sq.can_npc_enter():
             self.x += dx
             self.y += dy
+            npc_index.move(self.id, (self.x, self.y))
             return True
         return False
     
     def move_towards_sub(self, dist : int) -> bool:
         """
-        Looks for the closest sub in range, and moves towards it.
+        Moves a step closer to the closest sub, if one is at most dist steps
+        away (going around walls).
         """
-        nearby_entities : List[Entity] = all_in_submap(self.get_position(), dist)
-        closest : Tuple[Optional[Submarine], int] = (None, 0)
-        for entity in nearby_entities:
-            if isinstance(entity, Submarine):
-                sub : Submarine = entity
-                this_dist = diagonal_distance(self.get_position(), sub.get_position())
-                if (closest[0] is None) or this_dist < closest[1]:
-                    closest = (entity, this_dist)
-        if closest[0] is not None:
-            direction = determine_direction(self.get_position(), closest[0].get_position())
-            if direction is not None:
-                rotated = rotate_direction(direction)
-                directions = [direction]
-                if rotated is not None:
-                    directions.append(rotated[0])
-                    directions.append(rotated[1])
-                for possible_direction in directions:
-                    if self.move(*go_in_direction(possible_direction)):
-                        return True
+        for (dx, dy) in flow_field(dist).towards_sub(self.get_position(), dist):
+            if self.move(dx, dy):
+                return True
         return False
     
     def get_position(self) -> Tuple[int, int]:
@@ -131,10 +228,10 @@ class NPC(Entity):
         return ""
     
     def all_subs_in_square(self) -> List[Submarine]:
-        return filtered_teams(lambda sub: sub.movement.x == self.x and sub.movement.y == self.y)
+        return sub_index.at((self.x, self.y))
     
     def all_npcs_in_square(self) -> List[NPC]:
-        return filtered_npcs(lambda npc: npc.x == self.x and npc.y == self.y and npc != self)
+        return [npc for npc in npc_index.at((self.x, self.y)) if npc != self]
 
     def all_in_square(self) -> List[Entity]:
         """
@@ -157,27 +254,60 @@ class NPC(Entity):
         return f"You took a photo of a {self.typename}! {self.photo}"
     
     def add_parent(self, parent : str):
-        self.parent = parent
+        self.parent = sys.intern(parent)
     
     def get_parent(self) -> Optional[Submarine]:
         if self.parent is None:
             return None
         return get_sub(self.parent)
 
+# The fields of each NPC class (and a getter for all of them at once), worked
+# out when first needed.
+schemas : Dict[type, Tuple[str, ...]] = {}
+getters : Dict[type, Callable[[NPC], Tuple[Any, ...]]] = {}
+# How to load each class from each set of saved fields (see NPC.loader).
+loaders : Dict[Tuple[type, Tuple[str, ...]], List[Tuple[Any, Optional[Callable[[Any], Any]]]]] = {}
+# The treasure NPCs carry, so NPCs carrying the same things share it.
+treasures : Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+def intern_string(value : Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+def shared_treasure(items : Iterable[str]) -> Tuple[str, ...]:
+    treasure = tuple(items)
+    shared = treasures.get(treasure)
+    if shared is None:
+        shared = tuple(sys.intern(item) for item in treasure)
+        treasures[shared] = shared
+    return shared
+
 npc_types : Dict[str, Callable[[int, int, int], NPC]] = {}
 
+# The largest activity radius of any NPC type.
+max_activity_radius = 0
+
 def load_npc_types():
     # Woo let's continue to avoid circular imports!
     from ALTANTIS.npcs.templates import ALL_NPCS
+    global max_activity_radius
 
     # Available NPC types. Note that "NPC" is used liberally here - it can refer to
     # monsters, non-player characters, and structures such as mines.
     for cl in ALL_NPCS:
         npc_types[cl.classname] = cl
+        if cl.activity_radius is not None:
+            max_activity_radius = max(max_activity_radius, cl.activity_radius)
 
 # All NPCs, listed by ID.
 npcs : Dict[int, NPC] = {}
 npc_max_id : int = 0
+# The IDs of NPCs that tick whether or not any subs are nearby.
+always_active : Set[int] = set()
+# The IDs of NPCs with damage to take.
+damaged : Set[int] = set()
+# Whether NPCs are ticking, so NPCs added during a turn know they start after
+# it.
+npcs_ticking = False
 
 def get_npc_types() -> List[str]:
     return list(npc_types.keys())
@@ -192,13 +322,63 @@ async def kill_npc(id : int, rattle : bool = True) -> bool:
     if id in get_npcs():
         if rattle: await npcs[id].deathrattle()
         del npcs[id]
+        npc_index.remove(id)
+        always_active.discard(id)
         return True
     return False
 
 async def npc_tick():
-    all_npcs = list(npcs.keys())
-    for npc in all_npcs:
-        await npcs[npc].on_tick()
+    """
+    Ticks every NPC that could do something this turn, in order of ID: those
+    near a sub (in full if it is within their activity radius, and reduced
+    if it is a little further), those that are always active and those with
+    damage to take. Everything else is dormant, and catches up when it next
+    ticks, so this only costs as much as the NPCs near subs.
+    """
+    global npcs_ticking, damaged
+    now = current_tick()
+    # How far the closest sub is from each NPC near one.
+    nearby : Dict[int, int] = {}
+    reach = max_activity_radius + NPC_REDUCED_MARGIN
+    for square in sub_index.occupied():
+        for npc in npc_index.within(square, reach):
+            dist = diagonal_distance(square, npc.get_position())
+            if npc.id not in nearby or dist < nearby[npc.id]:
+                nearby[npc.id] = dist
+    # NPCs added this turn don't tick until the next.
+    limit = npc_max_id
+    queue = sorted(set(nearby) | always_active | damaged)
+    queued = set(queue)
+    npcs_ticking = True
+    try:
+        while len(queue) > 0:
+            id = heapq.heappop(queue)
+            npc = npcs.get(id)
+            if npc is None or id >= limit:
+                continue
+            radius = npc.activity_radius
+            dist = nearby.get(id)
+            full = radius is None or npc.damage_to_apply > 0 or (dist is not None and dist <= radius)
+            reduced = not full and dist is not None and dist <= radius + NPC_REDUCED_MARGIN
+            if not (full or reduced):
+                continue
+            with tick_profiler.npc(npc.classname):
+                if npc.last_tick is not None and now - npc.last_tick > 1:
+                    npc.catch_up(now - npc.last_tick - 1)
+                npc.last_tick = now
+                if full:
+                    await npc.on_tick()
+                else:
+                    npc.reduced_tick()
+            # NPCs damaged by this one later on in the order still take it
+            # this turn.
+            for other in damaged - queued:
+                if other > id:
+                    heapq.heappush(queue, other)
+                    queued.add(other)
+    finally:
+        npcs_ticking = False
+        damaged = set(i for i in damaged if i in npcs and npcs[i].damage_to_apply > 0)
 
 def filtered_npcs(pred : Callable[[NPC], bool]) -> List[NPC]:
     """
@@ -212,7 +392,7 @@ def filtered_npcs(pred : Callable[[NPC], bool]) -> List[NPC]:
     return result
 
 async def interact_in_square(sub : Submarine, square : Tuple[int, int], arg) -> str:
-    in_square = filtered_npcs(lambda npc: (npc.x, npc.y) == square)
+    in_square = npc_index.at(square)
     message = ""
     for npc in in_square:
         if sub.power.get_power("scanners") >= npc.stealth:
@@ -230,31 +410,82 @@ def add_npc(npctype : str, x : int, y : int, sub : Optional[str]):
     if not in_world(x, y):
         return "Cannot place an NPC outside of the map."
     if npctype in npc_types:
-        global npc_max_id
-        id = npc_max_id
+        (id,) = add_npcs(npctype, [(x, y)], sub)
+        return f"Created NPC #{id} of type {npctype.title()}!"
+    return "That NPC type does not exist."
+
+def add_npcs(npctype : str, positions : Sequence[Tuple[int, int]], sub : Optional[str]) -> List[int]:
+    """
+    Adds an NPC of a type that exists at each of the positions (which must be
+    in the world), all in one go, returning their IDs.
+    """
+    global npc_max_id
+    cl = npc_types[npctype]
+    # They have nothing to catch up on from before they existed.
+    last_tick = current_tick() if npcs_ticking else current_tick() - 1
+    added : List[NPC] = []
+    for (x, y) in positions:
+        new_npc = cl(npc_max_id, x, y)
         npc_max_id += 1
-        new_npc = npc_types[npctype](id, x, y)
         if sub is not None:
             new_npc.add_parent(sub)
-        npcs[id] = new_npc
-        return f"Created NPC #{id} of type {npctype.title()}!"
-    return "That NPC type does not exist."
+        new_npc.treasure = shared_treasure(new_npc.treasure)
+        new_npc.last_tick = last_tick
+        npcs[new_npc.id] = new_npc
+        added.append(new_npc)
+    npc_index.add_many((npc.id, npc, (npc.x, npc.y)) for npc in added)
+    if cl.activity_radius is None:
+        always_active.update(npc.id for npc in added)
+    return [npc.id for npc in added]
 
-def npcs_to_json() -> Dict[str, Union[List[Dict[str, Any]], int]]:
+def npcs_to_json() -> Dict[str, Any]:
+    """
+    Saves each NPC as a row of its classname and then its fields, with the
+    fields of each class (its schema) saved once.
+    """
     npcs_list = []
-    all_npcs = list(npcs.keys())
-    for npc in all_npcs:
-        if npc in npcs:
-            npcs_list.append(npcs[npc].__dict__.copy())
-            npcs_list[-1]["classname"] = npcs[npc].classname
-    return {"npcs": npcs_list, "counter": npc_max_id}
+    schemas_used : Dict[str, List[str]] = {}
+    for npc in list(npcs.values()):
+        if npc.classname not in schemas_used:
+            schemas_used[npc.classname] = list(npc.schema())
+        npcs_list.append((npc.classname,) + npc.to_row())
+    return {"schemas": schemas_used, "npcs": npcs_list, "counter": npc_max_id}
+
+def npc_from_json(classname : str, fields : Tuple[str, ...], values : Sequence[Any], complete : bool) -> NPC:
+    """
+    Makes an NPC from its saved fields. If the save has every field the class
+    does (complete), there are no defaults to set up first.
+    """
+    cl = npc_types[classname]
+    if complete:
+        new_npc : NPC = cl.__new__(cl)
+    else:
+        new_npc = cl(0, 0, 0)
+    new_npc.load_fields(fields, values)
+    return new_npc
 
 def npcs_from_json(json : Dict[str, Any]):
     global npcs, npc_max_id
     npcs = {}
+    npc_index.clear()
+    always_active.clear()
+    damaged.clear()
     npc_max_id = json["counter"]
+    saved_schemas = json.get("schemas")
+    if saved_schemas is not None:
+        saved_schemas = {name: tuple(fields) for (name, fields) in saved_schemas.items()}
+        complete = {name: set(fields) >= set(npc_types[name].schema()) for (name, fields) in saved_schemas.items()}
     for npc in json["npcs"]:
-        new_npc : NPC = npc_types[npc["classname"]](0, 0, 0)
-        del npc["classname"]
-        new_npc.__dict__ = npc
-        npcs[new_npc.id] = new_npc
\ No newline at end of file
+        if saved_schemas is None:
+            # Older saves have a dictionary for each NPC, which might not
+            # have every field.
+            fields = tuple(field for field in npc if field != "classname")
+            new_npc = npc_from_json(npc["classname"], fields, [npc[field] for field in fields], False)
+        else:
+            new_npc = npc_from_json(npc[0], saved_schemas[npc[0]], npc[1:], complete[npc[0]])
+        npcs[new_npc.id] = new_npc
+        npc_index.add(new_npc.id, new_npc, (new_npc.x, new_npc.y))
+        if new_npc.activity_radius is None:
+            always_active.add(new_npc.id)
+        if new_npc.damage_to_apply > 0:
+            damaged.add(new_npc.id)
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+Spawns many NPCs at once, for filling the map with wildlife.
+A population is a dictionary saying what to spawn and where:
+    "type": the NPC type (required),
+    "count": how many (required),
+    "region": [x0, y0, x1, y1], the corners of the area to spawn in (both
+        included), which is the whole map if left out,
+    "density": rows of digits giving how likely each square of the region is
+        to get each NPC, starting from its top-left corner (so the first row
+        is y0), with squares the rows don't cover never chosen. Every square
+        is as likely as any other if left out,
+    "parent": the sub the NPCs belong to, if any.
+NPCs are only put on squares they can enter, chosen at random (so several can
+end up on the same square), and are added all in one go. Populations can be
+kept in JSON files in /populations, each a list of them.
+"""
+
+import json, random
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ALTANTIS.utils.consts import NPC_SPAWN_LIMIT
+from ALTANTIS.world.layers import layers
+from ALTANTIS.npcs.npc import npc_types, add_npcs
+
+def density_weights(rows : List[str], skip : Tuple[int, int], shape : Tuple[int, int]) -> np.ndarray:
+    """
+    Reads density rows into weights (indexed [x, y]) for a region of the
+    given shape, skipping the given number of columns and rows (the part of
+    the region off the map). Anything that isn't a digit has no chance.
+    """
+    weights = np.zeros(shape, dtype=np.float64)
+    for (y, row) in enumerate(rows[skip[1]:skip[1] + shape[1]]):
+        for (x, char) in enumerate(row[skip[0]:skip[0] + shape[0]]):
+            if char.isdigit():
+                weights[x, y] = int(char)
+    return weights
+
+def is_int(value : Any) -> bool:
+    # JSON true and false load as bools, which are also ints.
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def spawn_population(population : Dict[str, Any], parent : Optional[str] = None) -> str:
+    """
+    Spawns a population, returning a message saying what happened. The parent
+    is used if the population doesn't say.
+    """
+    npctype = population.get("type")
+    if not isinstance(npctype, str) or npctype not in npc_types:
+        return f"NPC type {npctype} does not exist."
+    count = population.get("count")
+    if not is_int(count) or count <= 0 or count > NPC_SPAWN_LIMIT:
+        return f"Can only spawn between 1 and {NPC_SPAWN_LIMIT} NPCs at once."
+    (x_limit, y_limit) = layers.blocked.shape
+    region = population.get("region", [0, 0, x_limit - 1, y_limit - 1])
+    if not isinstance(region, list) or len(region) != 4 or not all(is_int(corner) for corner in region):
+        return "A region needs to be four numbers, x0 y0 x1 y1."
+    (left, top) = (min(region[0], region[2]), min(region[1], region[3]))
+    (x0, x1) = (max(left, 0), min(max(region[0], region[2]), x_limit - 1))
+    (y0, y1) = (max(top, 0), min(max(region[1], region[3]), y_limit - 1))
+    if x0 > x1 or y0 > y1:
+        return "That region is outside of the map."
+    shape = (x1 - x0 + 1, y1 - y0 + 1)
+    density = population.get("density", [])
+    if not isinstance(density, list) or not all(isinstance(row, str) for row in density):
+        return "A density needs to be a list of rows of digits."
+    parent = population.get("parent", parent)
+    if parent is not None and not isinstance(parent, str):
+        return "A parent needs to be the name of a sub."
+    if "density" in population:
+        weights = density_weights(density, (x0 - left, y0 - top), shape)
+    else:
+        weights = np.ones(shape, dtype=np.float64)
+    # NPCs can't go in squares that are blocked (walls and docking stations).
+    weights[layers.blocked[x0:x1 + 1, y0:y1 + 1]] = 0
+    (xs, ys) = np.nonzero(weights)
+    if len(xs) == 0:
+        return f"There is nowhere in that region for a {npctype.title()} to go."
+    if "density" in population:
+        chosen = random.choices(range(len(xs)), weights=weights[xs, ys].tolist(), k=count)
+    else:
+        chosen = random.choices(range(len(xs)), k=count)
+    positions = [(x0 + int(xs[i]), y0 + int(ys[i])) for i in chosen]
+    ids = add_npcs(npctype, positions, parent)
+    return f"Created {count} NPCs of type {npctype.title()} (#{ids[0]} to #{ids[-1]})!"
+
+def load_populations(path : str) -> List[Dict[str, Any]]:
+    """
+    Reads a populations file, which holds either one population or a list of
+    them. Raises a ValueError if it holds anything else.
+    """
+    with open(path) as f:
+        populations = json.load(f)
+    if isinstance(populations, dict):
+        populations = [populations]
+    if not isinstance(populations, list) or not all(isinstance(population, dict) for population in populations):
+        raise ValueError(f"{path} should hold a population or a list of them.")
+    return populations
+
+def spawn_populations(populations : List[Dict[str, Any]]) -> str:
+    return "\n".join(spawn_population(population) for population in populations)
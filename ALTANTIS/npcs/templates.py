@@ -2,18 +2,26 @@
 All possible NPC types.
 """
 
-import random
+import random, sys
 
 from ALTANTIS.utils.consts import CURRENCY_NAME, RESOURCES
 from ALTANTIS.utils.control import notify_news
-from ALTANTIS.world.world import get_square
+from ALTANTIS.world.world import get_square, weather_within, weather_ring
 from ALTANTIS.world.extras import all_in_submap, explode
 from ALTANTIS.npcs.npc import NPC, add_npc
 
+# Where NPC photos are.
+PHOTO_URL = "https://www.warwicktabletop.co.uk/static/megagame/2020/"
+
+def photo_url(filename : str) -> str:
+    # Every NPC of a kind shares the one string.
+    return sys.intern(PHOTO_URL + filename)
+
 class PhotographableNPC(NPC):
+    __slots__ = ()
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
-        self.photo = "https://www.warwicktabletop.co.uk/static/megagame/2020/"
+        self.photo = PHOTO_URL
 
     async def interact(self, sub, _) -> str:
         return self.take_photo(sub)
@@ -22,14 +30,18 @@ class PhotographableNPC(NPC):
         return True
 
 class Squid(PhotographableNPC):
+    __slots__ = ("tick_count",)
     classname = "squid"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.tick_count = 0
         self.health = 2
         self.treasure = [CURRENCY_NAME]
-        self.photo += "squid.png"
+        self.photo = photo_url("squid.png")
     
+    def catch_up(self, ticks):
+        self.count_ticks(3, ticks)
+
     async def attack(self):
         if self.tick_count >= 3:
             self.tick_count -= 3
@@ -39,6 +51,7 @@ class Squid(PhotographableNPC):
             self.tick_count += 1
 
 class BigSquid(PhotographableNPC):
+    __slots__ = ("tick_count",)
     classname = "giant_squid"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
@@ -46,7 +59,10 @@ class BigSquid(PhotographableNPC):
         self.health = 3
         self.treasure = [CURRENCY_NAME, CURRENCY_NAME]
         self.typename = "Giant Squid"
-        self.photo += "giant-squid.png"
+        self.photo = photo_url("giant-squid.png")
+
+    def catch_up(self, ticks):
+        self.count_ticks(2, ticks)
 
     async def attack(self):
         if self.tick_count >= 2:
@@ -57,6 +73,7 @@ class BigSquid(PhotographableNPC):
             self.tick_count += 1
 
 class Octopus(PhotographableNPC):
+    __slots__ = ("tick_count",)
     classname = "octopus"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
@@ -64,7 +81,10 @@ class Octopus(PhotographableNPC):
         self.health = 1
         self.treasure = [random.choice(RESOURCES)]
         self.typename = "Giant Octopus"
-        self.photo += "giant-octopus.png"
+        self.photo = photo_url("giant-octopus.png")
+
+    def catch_up(self, ticks):
+        self.count_ticks(2, ticks)
 
     async def attack(self):
         if self.tick_count >= 2:
@@ -75,13 +95,18 @@ class Octopus(PhotographableNPC):
             self.tick_count += 1
 
 class Shark(PhotographableNPC):
+    __slots__ = ("tick_count",)
     classname = "shark"
+    activity_radius = 4
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.tick_count = 0
         self.health = 2
         self.treasure = [random.choice(RESOURCES)]
     
+    def catch_up(self, ticks):
+        self.count_ticks(3, ticks)
+
     async def attack(self):
         if self.tick_count >= 3:
             self.tick_count -= 3
@@ -95,28 +120,32 @@ class Shark(PhotographableNPC):
             self.tick_count += 1
 
 class Hammerhead(Shark):
+    __slots__ = ()
     classname = "hammerhead"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.typename = "Hammerhead Shark"
-        self.photo += "hammerhead.png"
+        self.photo = photo_url("hammerhead.png")
 
 class Bull(Shark):
+    __slots__ = ()
     classname = "bullshark"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.typename = "Bull Shark"
-        self.photo += "bull-shark.png"
+        self.photo = photo_url("bull-shark.png")
         self.health = 4
 
 class Orca(Shark):
+    __slots__ = ()
     classname = "orca"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
-        self.photo += "orca.png"
+        self.photo = photo_url("orca.png")
         self.health = 3
 
 class Whale(PhotographableNPC):
+    __slots__ = ()
     classname = "whale"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
@@ -129,39 +158,43 @@ class Whale(PhotographableNPC):
             await sub.send_message(f"{self.name()} is having a _whale_ of a time.", "captain")
 
 class WhaleShark(Whale):
+    __slots__ = ()
     classname = "whaleshark"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.typename = "Whale Shark"
-        self.photo += "whale-shark.png"
+        self.photo = photo_url("whale-shark.png")
         self.treasure.append("petunia-bowl")
 
 class Humpback(Whale):
+    __slots__ = ()
     classname = "humpback"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
-        self.photo += "humpback-whale.png"
+        self.photo = photo_url("humpback-whale.png")
 
 class Dolphin(PhotographableNPC):
+    __slots__ = ()
     classname = "dolphin"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 2
         self.treasure = ["unexploded-bomb*"]
-        self.photo += "dolphin.png"
+        self.photo = photo_url("dolphin.png")
 
     async def interact(self, sub, arg):
         photo_message = await super().interact(sub, arg)
         return f"The dolphin made a few happy noises!\n{photo_message}"
 
 class MantaRay(PhotographableNPC):
+    __slots__ = ()
     classname = "mantaray"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 2
         self.treasure = [random.choice(RESOURCES)] * 2
         self.typename = "Manta Ray"
-        self.photo += "manta-ray.png"
+        self.photo = photo_url("manta-ray.png")
     
     async def interact(self, sub, arg):
         photo_message = await super().interact(sub, arg)
@@ -178,12 +211,13 @@ class MantaRay(PhotographableNPC):
             add_npc("eel", location[0], location[1], None)
 
 class Turtle(PhotographableNPC):
+    __slots__ = ()
     classname = "turtle"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 2
         self.treasure = [CURRENCY_NAME] * 3
-        self.photo += "turtle.png"
+        self.photo = photo_url("turtle.png")
     
     async def interact(self, sub, arg):
         photo_message = await super().interact(sub, arg)
@@ -200,15 +234,27 @@ class Turtle(PhotographableNPC):
             add_npc("squid", location[0], location[1], None)
 
 class Eel(PhotographableNPC):
+    __slots__ = ("tick_count",)
     classname = "eel"
+    # It moves before zapping.
+    activity_radius = 1
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 2
         self.treasure = [random.choice(RESOURCES)]
         self.tick_count = 0
         self.typename = "Giant Eel"
-        self.photo += "electric-eel.png"
+        self.photo = photo_url("electric-eel.png")
     
+    def reduced_tick(self):
+        # It still wanders about, but there's no one close enough to zap.
+        if self.tick_count >= 2:
+            self.move(random.choice([-1,0,1]), random.choice([-1,0,1]))
+        self.count_ticks(2, 1)
+
+    def catch_up(self, ticks):
+        self.count_ticks(2, ticks)
+
     async def attack(self):
         if self.tick_count >= 2:
             self.tick_count -= 2
@@ -222,6 +268,7 @@ class Eel(PhotographableNPC):
             self.tick_count += 1
 
 class AnglerFish(PhotographableNPC):
+    __slots__ = ("tick_count",)
     classname = "angler"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
@@ -230,7 +277,10 @@ class AnglerFish(PhotographableNPC):
         self.treasure = [CURRENCY_NAME, random.choice(RESOURCES)]
         self.stealth = 2
         self.typename = "Angler Fish"
-        self.photo += "angler-fish.png"
+        self.photo = photo_url("angler-fish.png")
+
+    def catch_up(self, ticks):
+        self.count_ticks(2, ticks)
 
     async def attack(self):
         if self.tick_count >= 2:
@@ -241,6 +291,7 @@ class AnglerFish(PhotographableNPC):
             self.tick_count += 1
 
 class Urchin(PhotographableNPC):
+    __slots__ = ("visited",)
     classname = "urchin"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
@@ -250,7 +301,12 @@ class Urchin(PhotographableNPC):
         self.observant = True
         # Which subs were in this square previously.
         self.visited = []
-        self.photo += "giant-sea-urchin.png"
+        self.photo = photo_url("giant-sea-urchin.png")
+
+    def catch_up(self, ticks):
+        # No subs have been here.
+        if ticks > 0:
+            self.visited = []
     
     async def attack(self):
         new_visited = []
@@ -261,12 +317,13 @@ class Urchin(PhotographableNPC):
         self.visited = new_visited
 
 class Crab(PhotographableNPC):
+    __slots__ = ()
     classname = "crab"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.treasure = ["crab-meat"]
         self.typename = "Giant Crab"
-        self.photo += "giant-crab.png"
+        self.photo = photo_url("giant-crab.png")
     
     async def attack(self):
         for sub in self.all_subs_in_square():
@@ -279,14 +336,17 @@ class Crab(PhotographableNPC):
                         await sub.send_message(message, "captain")
 
 class Jellyfish(PhotographableNPC):
+    __slots__ = ()
     classname = "jellyfish"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.stealth = 2
-        self.photo += "giant-jellyfish.png"
+        self.photo = photo_url("giant-jellyfish.png")
 
 class DeepOne(NPC):
+    __slots__ = ()
     classname = "deepone"
+    activity_radius = 4
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 5
@@ -302,7 +362,9 @@ class DeepOne(NPC):
         return True
 
 class Ears(NPC):
+    __slots__ = ()
     classname = "ears"
+    activity_radius = None
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 3
@@ -328,12 +390,14 @@ class Ears(NPC):
             await parent.send_message(full_message, "scientist")
 
 class DeepOneTwo(DeepOne):
+    __slots__ = ()
     classname = "deeponetwo"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.stealth = 2
 
 class NewsBuoy(NPC):
+    __slots__ = ()
     classname = "buoy"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
@@ -343,6 +407,7 @@ class NewsBuoy(NPC):
         await notify_news(f"{self.x}, {self.y}: {content}")
 
 class Mine(NPC):
+    __slots__ = ("countdown",)
     classname = "mine"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
@@ -362,23 +427,21 @@ class Mine(NPC):
         await explode(self.get_position(), 2)
 
 class StormGenerator(NPC):
+    __slots__ = ()
     classname = "stormer"
+    activity_radius = None
     async def on_tick(self):
         await super().on_tick()
-        for dx in range(-2,3):
-            for dy in range(-2,3):
-                sq = get_square(self.x + dx, self.y + dy)
-                if sq: sq.add_attribute("weather", "storm")
+        weather_within("stormy", self.get_position(), 2)
 
     async def deathrattle(self):
         await super().deathrattle()
-        for dx in range(-2,3):
-            for dy in range(-2,3):
-                sq = get_square(self.x + dx, self.y + dy)
-                if sq: sq.add_attribute("weather", "normal")
+        weather_within("normal", self.get_position(), 2)
 
 class RoughSeasGenerator(NPC):
+    __slots__ = ("storm_dist", "tick_count")
     classname = "rougher"
+    activity_radius = None
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.storm_dist = 0
@@ -393,31 +456,20 @@ class RoughSeasGenerator(NPC):
             self.tick_count -= 2
             # Make all squares which are storm_dist away rough seas.
             # Because we use diagonal distance, this is a square perimeter.
-            sd = self.storm_dist
-            corners = [(sd, sd), (-sd, -sd)]
-            for corner in corners:
-                for x in range(-sd, sd+1):
-                    sq = get_square(self.x+x, self.y+corner[1])
-                    if sq: sq.add_attribute("weather", "rough")
-                for y in range(-sd, sd+1):
-                    sq = get_square(self.x+corner[0], self.y+y)
-                    if sq: sq.add_attribute("weather", "rough")
+            weather_ring("rough", self.get_position(), self.storm_dist)
             self.storm_dist += 1
     
     async def deathrattle(self):
         await super().deathrattle()
-        sd = self.storm_dist
-        for dx in range(-sd, sd+1):
-            for dy in range(-sd, sd+1):
-                sq = get_square(self.x+dx, self.y+dy)
-                if sq: sq.add_attribute("weather", "normal")
+        weather_within("normal", self.get_position(), self.storm_dist)
 
 class Trader(NPC):
+    __slots__ = ("resource",)
     classname = "trader"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.resource = random.choice(RESOURCES)
-        self.typename = f"{self.resource.title()} Trader"
+        self.typename = sys.intern(f"{self.resource.title()} Trader")
 
     async def on_tick(self):
         await super().on_tick()
@@ -438,7 +490,9 @@ class Trader(NPC):
         return "Invalid option."
 
 class Quarry(NPC):
+    __slots__ = ()
     classname = "quarry"
+    activity_radius = None
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 14
@@ -453,7 +507,9 @@ class Quarry(NPC):
         return False
 
 class BreedingGround(NPC):
+    __slots__ = ()
     classname = "breeding"
+    activity_radius = None
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 10
@@ -4,6 +4,7 @@ Manages the state dictionary, which keeps track of all submarines.
 
 from ALTANTIS.subs.sub import sub_from_dict, Submarine
 from ALTANTIS.utils.actions import DiscordAction
+from ALTANTIS.world.spatial import sub_index
 
 from typing import Dict, List, Any, Callable, Awaitable, Optional
 import discord
@@ -59,6 +60,7 @@ def add_team(name : str, category : discord.CategoryChannel, x : int, y : int, k
         for channel in child_channels:
             channel_dict[channel.name] = channel
         state[name] = Submarine(name, channel_dict, x, y, keyword)
+        sub_index.add(name, state[name], (x, y))
         return True
     return False
 
@@ -68,6 +70,7 @@ def remove_team(name : str) -> bool:
     """
     if name in get_subs():
         del state[name]
+        sub_index.remove(name)
         return True
     return False
 
@@ -87,6 +90,8 @@ def state_from_dict(dictionary : Dict[str, Dict[str, Any]], client : discord.Cli
     """
     global state
     new_state = {}
+    sub_index.clear()
     for subname in dictionary:
         new_state[subname] = sub_from_dict(dictionary[subname], client)
+        sub_index.add(subname, new_state[subname], new_state[subname].movement.get_position())
     state = new_state
\ No newline at end of file
@@ -7,6 +7,8 @@ import discord
 
 from ALTANTIS.utils.entity import Entity
 from ALTANTIS.utils.roles import create_or_return_role
+from ALTANTIS.utils.outbox import outbox
+from ALTANTIS.utils.journal import journal
 from ALTANTIS.world.world import get_square
 
 subsystems = ["power", "comms", "movement", "puzzles", "scan", "inventory", "weapons", "upgrades"]
@@ -54,17 +56,19 @@ class Submarine(Entity):
         return message + "\nNo more to report."
     
     async def send_message(self, content : str, channel : str, filename : str = None) -> bool:
-        fp = None
-        if filename:
-            fp = discord.File(filename)
+        """
+        Queues a message to one of this sub's channels (see utils/outbox.py).
+        Returns whether it was queued - not whether it was delivered, as that
+        happens later.
+        """
         if self.channels[channel]:
-            await self.channels[channel].send(content, file=fp)
+            outbox.post(self.channels[channel], content, filename)
             return True
         return False
     
     async def send_to_all(self, content : str) -> bool:
         for channel in self.channels:
-            await self.channels[channel].send(content)
+            outbox.post(self.channels[channel], content)
         return True
     
     def damage(self, amount : int):
@@ -78,6 +82,8 @@ class Submarine(Entity):
         Finds all members of this sub (by finding those with the relevant role)
         and gives them the docked-at-{base_name} role.
         This is undone when the sub is activated.
+        Roles are left alone while replaying the journal, as the players
+        already have them.
         """
         def has_subname_role(member : discord.Member) -> bool:
             roles = member.roles
@@ -87,11 +93,12 @@ class Submarine(Entity):
         square = self.movement.get_square()
         location = square.docked_at()
         if location:
-            role_name = f"docked-at-{location.lower()}"
-            in_sub = filter(has_subname_role, guild.members)
-            role = await create_or_return_role(guild, role_name)
-            for member in in_sub:
-                await member.add_roles(role)
+            if not journal.replaying:
+                role_name = f"docked-at-{location.lower()}"
+                in_sub = filter(has_subname_role, guild.members)
+                role = await create_or_return_role(guild, role_name)
+                for member in in_sub:
+                    await member.add_roles(role)
             await self.send_to_all(f"Team has left submarine at **{location.title()}**. Submarine is now off it is wasn't already. You will be automatically returned when the submarine is turned back on.")
             self.power.activate(False)
             return "Successfully left the submarine."
@@ -101,13 +108,16 @@ class Submarine(Entity):
         """
         Finds all members of this sub (by finding those with the relevant role)
         and then removes any docked-at-{x} role.
-        Call this when a sub is activated.
+        Call this when a sub is activated. Like docking, this does nothing
+        while replaying the journal.
         """
         def has_subname_role(member : discord.Member) -> bool:
             roles = member.roles
             role_names = map(lambda r: r.name, roles)
             return self._name in role_names
 
+        if journal.replaying:
+            return
         in_sub = filter(has_subname_role, guild.members)
         for member in in_sub:
             roles_to_remove = []
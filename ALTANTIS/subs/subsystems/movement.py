@@ -2,15 +2,23 @@
 Allows the sub to move.
 """
 import math, datetime
-from typing import Tuple, Optional
+from typing import Tuple, Optional, List
 
 from ALTANTIS.world.world import possible_directions, get_square, in_world, Cell
+from ALTANTIS.world.spatial import sub_index
+from ALTANTIS.world.pathfinding import pathfinder, step_direction
 from ALTANTIS.utils.consts import GAME_SPEED, direction_emoji, TICK, CROSS
 from ALTANTIS.utils.direction import directions, reverse_dir
 from ALTANTIS.utils.errors import SubmarineOutOfBoundsError
 from ..sub import Submarine
 
 class MovementControls():
+    # The square the autopilot is taking us to, if any (see set_course), the
+    # route it is following there and the terrain along that route when it
+    # was found. Older saves won't have them.
+    course : Optional[Tuple[int, int]] = None
+    route : List[Tuple[int, int]] = []
+    route_terrain : List[int] = []
     def __init__(self, sub : Submarine, x : int, y : int):
         self.sub = sub
         self.direction = "n"
@@ -24,6 +32,7 @@ class MovementControls():
         """
         Updates internal state and moves if it is time to do so.
         """
+        course_message = self.steer()
         self.movement_progress += self.sub.power.get_power("engines")
         threshold = get_square(self.x, self.y).difficulty()
         if "blessing" in self.sub.upgrades.keywords:
@@ -38,6 +47,12 @@ class MovementControls():
                 f"**{self.sub.name()}** is now at position **{self.get_position()}**."
             )
 
+            if self.course is not None and self.get_position() == tuple(self.course):
+                self.cancel_course()
+                move_status += f"\n**{self.sub.name()}** has reached its destination, so the autopilot is now off."
+            if course_message:
+                move_status = f"{course_message}\n{move_status}"
+
             # Do all the puzzles stuff.
             await self.sub.puzzles.movement_tick()
 
@@ -48,7 +63,55 @@ class MovementControls():
             if message:
                 return f"{message}\n{move_status}", trade_messages
             return move_status, trade_messages
-        return None, {}
+        return course_message, {}
+
+    def set_course(self, x : int, y : int) -> Optional[int]:
+        """
+        Sets the autopilot to take us to (x, y), steering every turn. Returns
+        how many moves it will take (or, if it is too far to plan the whole
+        route at once, the first part of it), or None if there is no way there.
+        """
+        path = pathfinder.find_path(self.get_position(), (x, y))
+        if path is None or len(path) < 2:
+            return None
+        self.course = (x, y)
+        self.route = path
+        self.route_terrain = pathfinder.terrain(path)
+        self.steer()
+        return len(path) - 1
+
+    def cancel_course(self):
+        self.course = None
+        self.route = []
+        self.route_terrain = []
+
+    def steer(self) -> Optional[str]:
+        """
+        Points us along the quickest route to where the autopilot is taking
+        us, turning the autopilot off if we're there or can't get there.
+        """
+        if self.course is None:
+            return None
+        course = tuple(self.course)
+        position = self.get_position()
+        if position == course:
+            self.cancel_course()
+            return f"**{self.sub.name()}** is at its destination, so the autopilot is now off."
+        # Routes come back from saves as lists.
+        route = [tuple(pos) for pos in self.route]
+        along = pathfinder.follow(route, self.route_terrain, position)
+        if along is None or along == len(route) - 1:
+            # We're off the route, it has changed or we've got to the end of
+            # the part planned so far, so find a new one.
+            path = pathfinder.find_path(position, course)
+            if path is None or len(path) < 2:
+                self.cancel_course()
+                return f"The autopilot could not find a route to **{course}**, so is now off."
+            (route, along) = (path, 0)
+            self.route = path
+            self.route_terrain = pathfinder.terrain(path)
+        self.direction = step_direction(route[along], route[along + 1])
+        return None
     
     def set_direction(self, direction : str) -> bool:
         if direction in possible_directions():
@@ -63,6 +126,7 @@ class MovementControls():
         if in_world(x, y):
             self.x = x
             self.y = y
+            sub_index.move(self.sub._name, (x, y))
             return True
         return False
 
@@ -89,6 +153,7 @@ class MovementControls():
             return message
         self.x = new_x
         self.y = new_y
+        sub_index.move(self.sub._name, (new_x, new_y))
         return message
     
     def status(self, loop) -> str:
@@ -110,7 +175,10 @@ class MovementControls():
             if time_until_next != math.inf:
                 message += f"Next game turn will occur in {int(time_until_next)}s.\n"
                 message += f"Next move estimated to occur in {int(time_until_move)}s ({turns_until_move} {turns_plural}).\n"
-            message += f"Currently moving **{self.direction.upper()}** ({direction_emoji[self.direction]}) and in position **({self.x}, {self.y})**.\n\n"
+            message += f"Currently moving **{self.direction.upper()}** ({direction_emoji[self.direction]}) and in position **({self.x}, {self.y})**.\n"
+            if self.course is not None:
+                message += f"The autopilot is taking us to **{tuple(self.course)}**.\n"
+            message += "\n"
         else:
             message += f"Submarine is currently offline. {CROSS}\n\n"
         return message
\ No newline at end of file
@@ -1,7 +1,7 @@
 """
 Deals with the engineering puzzles, which need to be imported, served and marked.
 """
-import json, glob
+import json, glob, os
 from random import choice
 from typing import Tuple, List, Optional, Dict, Union
 
@@ -9,8 +9,10 @@ from ALTANTIS.utils.control import notify_control
 from ..sub import Submarine
 
 answers : Dict[str, List[str]] = {}
-with open("puzzles/answers.json", "r") as ans_file:
-    answers = json.loads(ans_file.read())
+# Headless runs (such as the benchmark) don't come with a puzzles directory.
+if os.path.exists("puzzles/answers.json"):
+    with open("puzzles/answers.json", "r") as ans_file:
+        answers = json.loads(ans_file.read())
 
 puzzles_available = glob.glob("puzzles/*")
 
@@ -58,6 +60,8 @@ class EngineeringPuzzles():
             await self.resolve_puzzle(None)
         if len(self.puzzles) == 0:
             self.puzzles = load_all_puzzles()
+        if len(self.puzzles) == 0:
+            return False
         
         puzzle_to_deliver = self.puzzles[0]
         self.puzzles = self.puzzles[1:]
@@ -1,14 +1,19 @@
 """
 Allows the sub to scan and be scanned.
 """
+import math
 from random import shuffle
-from typing import Tuple, List, Collection
+from typing import Tuple, List, Collection, Dict
 
-from ALTANTIS.utils.direction import diagonal_distance, determine_direction
-from ALTANTIS.utils.consts import X_LIMIT, Y_LIMIT
-from ALTANTIS.subs.state import get_sub_objects
-from ALTANTIS.npcs.npc import get_npc_objects
-from ALTANTIS.world.world import get_square
+import numpy as np
+
+from ALTANTIS.utils.consts import SCAN_CACHE_SIZE
+from ALTANTIS.utils.direction import diagonal_distance
+from ALTANTIS.utils.geometry import direction_between, distance_kernel
+from ALTANTIS.world.world import get_square, map_size, current_tick
+from ALTANTIS.world.consts import SPAWNS
+from ALTANTIS.world.layers import layers
+from ALTANTIS.world.spatial import sub_index, npc_index
 from ..sub import Submarine
 
 class ScanSystem():
@@ -61,53 +66,87 @@ class ScanSystem():
     def previous_scan(self) -> str:
         return self.prev_scan
     
+# What the squares around a point look like to a scan, by (position, range,
+# whether distances are shown). Each entry is (layers generation, version of
+# the squares in range, the turn it expires on, events).
+square_cache : Dict[Tuple[Tuple[int, int], int, bool], Tuple[int, int, float, List[str]]] = {}
+
+def square_events(pos : Tuple[int, int], dist : int, with_distance : bool) -> List[str]:
+    """
+    The outward_broadcast events of the squares within dist of pos.
+    These are cached until a square in range changes or is due to spawn
+    treasure, so a sub whose surroundings haven't changed since its last scan
+    doesn't look at any squares at all.
+    """
+    (cx, cy) = pos
+    (x_limit, y_limit) = map_size()
+    (x_min, x_max) = (max(cx - dist, 0), min(cx + dist + 1, x_limit))
+    (y_min, y_max) = (max(cy - dist, 0), min(cy + dist + 1, y_limit))
+    if x_min >= x_max or y_min >= y_max:
+        return []
+    window = (slice(x_min, x_max), slice(y_min, y_max))
+    key = (pos, dist, with_distance)
+    if key in square_cache:
+        (generation, version, expires, events) = square_cache[key]
+        if generation == layers.generation and version == layers.window_version(*window) and current_tick() < expires:
+            return list(events)
+        del square_cache[key]
+
+    # We use the map's layers to find the squares in range that have
+    # something to show and aren't hidden at that distance, and only look at
+    # those.
+    events = []
+    distances = distance_kernel(dist)[x_min - cx + dist:x_max - cx + dist, y_min - cy + dist:y_max - cy + dist]
+    visible = layers.broadcasting(*window) & (layers.hiddenness[window] <= dist - distances)
+    # The first turn on which one of these squares spawns treasure.
+    next_spawn = math.inf
+    for (i, j) in np.argwhere(visible):
+        (x, y) = (x_min + int(i), y_min + int(j))
+        this_dist = int(distances[i, j])
+        sq = get_square(x, y)
+        if sq is None:
+            continue
+        event = sq.outward_broadcast(dist - this_dist)
+        for kind in SPAWNS:
+            if kind in sq.next_event:
+                next_spawn = min(next_spawn, sq.next_event[kind])
+        if event != "":
+            direction = direction_between((cx, cy), (x, y))
+            if direction is None:
+                event = f"{event} - in your current square!"
+            else:
+                distance_measure = ""
+                if with_distance:
+                    distance_measure = f" at a distance of {this_dist} away"
+                event = f"{event} - in direction {direction.upper()}{distance_measure}!"
+            events.append(event)
+
+    # Taken after catching up, which may have spawned treasure.
+    version = layers.window_version(*window)
+    if len(square_cache) >= SCAN_CACHE_SIZE:
+        del square_cache[next(iter(square_cache))]
+    square_cache[key] = (layers.generation, version, next_spawn, events)
+    return list(events)
+
 def explore_submap(pos : Tuple[int, int], dist : int, sub_exclusions : Collection[str] = (), npc_exclusions : Collection[int] = (), with_distance : bool = False) -> List[str]:
     """
     Explores the area centered around pos = (cx, cy) spanning distance dist.
     Returns all outward_broadcast events (as a list) formatted for output.
     Ignores any NPCs or subs with a name included in exclusions.
     """
-    events = []
-    (cx, cy) = pos
     # First, map squares.
-    for i in range(-dist, dist+1):
-        x = cx + i
-        if x < 0 or x >= X_LIMIT:
-            continue
-        for j in range(-dist, dist+1):
-            y = cy + j
-            if y < 0 or y >= Y_LIMIT:
-                continue
-            this_dist = diagonal_distance((0, 0), (i, j))
-            sq = get_square(x, y)
-            if sq is None:
-                continue
-            event = sq.outward_broadcast(dist - this_dist)
-            if event != "":
-                direction = determine_direction((cx, cy), (x, y))
-                if direction is None:
-                    event = f"{event} - in your current square!"
-                else:
-                    distance_measure = ""
-                    if with_distance:
-                        distance_measure = f" at a distance of {this_dist} away"
-                    event = f"{event} - in direction {direction.upper()}{distance_measure}!"
-                events.append(event)
+    events = square_events(pos, dist, with_distance)
 
     # Then, submarines.
-    for sub in get_sub_objects():
+    for sub in sub_index.within(pos, dist):
         if sub._name in sub_exclusions:
             continue
 
         sub_pos = sub.movement.get_position()
         sub_dist = diagonal_distance(pos, sub_pos)
-
-        # If out of range, drop it.
-        if sub_dist > dist:
-            continue
         
         event = sub.scan.outward_broadcast(dist - sub_dist)
-        direction = determine_direction(pos, sub_pos)
+        direction = direction_between(pos, sub_pos)
         if direction is None:
             event = f"{event} in your current square!"
         else:
@@ -115,18 +154,15 @@ def explore_submap(pos : Tuple[int, int], dist : int, sub_exclusions : Collectio
         events.append(event)
     
     # Finally, NPCs.
-    for npc in get_npc_objects():
+    for npc in npc_index.within(pos, dist):
         if npc.id in npc_exclusions:
             continue
         
         npc_pos = npc.get_position()
         npc_dist = diagonal_distance(pos, npc_pos)
 
-        if npc_dist > dist:
-            continue
-
         event = npc.outward_broadcast(dist - npc_dist)
-        direction = determine_direction(pos, npc_pos)
+        direction = direction_between(pos, npc_pos)
         if direction is None:
             event = f"{event} in your current square!"
         else:
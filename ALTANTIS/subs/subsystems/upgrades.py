@@ -2,7 +2,6 @@
 A subsystem for upgrades, handed to subs via keywords from control.
 """
 
-from ALTANTIS.cogs.map import mass_weather
 from typing import Tuple, Any, Optional, List
 
 from ALTANTIS.utils.text import to_titled_list, list_to_and_separated
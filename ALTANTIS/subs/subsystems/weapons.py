@@ -2,12 +2,11 @@
 Allows subs to charge and fire (stunning) weapons.
 """
 
-from ALTANTIS.subs.state import get_sub_objects
-from ALTANTIS.npcs.npc import get_npc_objects
 from ALTANTIS.utils.direction import diagonal_distance
 from ALTANTIS.utils.text import list_to_and_separated
 from ALTANTIS.utils.entity import Entity
 from ALTANTIS.world.world import in_world
+from ALTANTIS.world.spatial import sub_index, npc_index
 from ..sub import Submarine
 
 import math
@@ -69,7 +68,7 @@ class Weaponry():
         # Returns a list of indirect and direct hits.
         indirect : List[Entity] = []
         direct : List[Entity] = []
-        for sub in get_sub_objects():
+        for sub in sub_index.within((x, y), 1):
             pos = sub.movement.get_position()
             distance = diagonal_distance(pos, (x, y))
             if distance == 0:
@@ -77,7 +76,7 @@ class Weaponry():
             elif distance == 1:
                 indirect.append(sub)
         
-        for npc in get_npc_objects():
+        for npc in npc_index.within((x, y), 1):
             pos = npc.get_position()
             distance = diagonal_distance(pos, (x, y))
             if distance == 0:
@@ -1,3 +1,7 @@
+import io
+
+import discord
+
 from ALTANTIS.utils.consts import TICK, CROSS
 
 class DiscordAction():
@@ -21,6 +25,17 @@ class Message(DiscordAction):
     async def do_status(self, ctx):
         await ctx.send(self.contents)
 
+class FileMessage(DiscordAction):
+    """
+    A message with files attached, given as (filename, bytes) pairs.
+    """
+    def __init__(self, contents, files):
+        self.contents = contents
+        self.files = files
+
+    async def do_status(self, ctx):
+        await ctx.send(self.contents, files=[discord.File(io.BytesIO(data), filename=filename) for (filename, data) in self.files])
+
 OKAY_REACT = React(TICK)
 FAIL_REACT = React(CROSS)
 
@@ -9,6 +9,44 @@ RESOURCES = ["circuits", "specimens", "plating", "tools"]
 # The speed of the game, in _seconds_. Remember that most submarines will start
 # moving every four "turns", so really you should think about 4*GAME_SPEED.
 GAME_SPEED = 60
+# How many ticks of timings !tickstats looks back over.
+PROFILE_WINDOW = 100
+
+# NPCs with no sub within their activity radius still tick (in a reduced way
+# that keeps them moving about) if a sub is within this many more squares,
+# and otherwise go dormant (see npc_tick in npcs/npc.py).
+NPC_REDUCED_MARGIN = 4
+# The most NPCs one population (see npcs/population.py) can spawn at once.
+NPC_SPAWN_LIMIT = 10000
+
+# How many different sweeps of the map (by position, range and triangulation)
+# scans keep cached.
+SCAN_CACHE_SIZE = 256
+# How many different sets of map options (and drawn maps) to keep cached.
+RENDER_CACHE_SIZE = 16
+# How many pixels across each square is when we draw the map as an image
+# ourselves (see world/mapimage.py).
+MAP_TILE_SIZE = 7
+# How many squares a search for an autopilot route can look at before settling
+# for part of the route (see world/pathfinding.py).
+PATH_SEARCH_LIMIT = 10000
+
+# Whether the bot should rebuild the game from the latest save and the journal
+# when it starts (see utils/journal.py). Otherwise it starts with an empty game,
+# and you can run !recover by hand.
+RECOVER_ON_STARTUP = True
+
+# Saves split the map into blocks this many cells across, and NPCs into
+# batches of this many IDs (see utils/store.py).
+SAVE_CHUNK_SIZE = 16
+NPC_CHUNK_SIZE = 64
+
+# Discord won't take posts longer than this.
+MESSAGE_LIMIT = 2000
+# Each channel is sent at most CHANNEL_RATE posts every CHANNEL_RATE_PERIOD
+# seconds, which keeps us under Discord's per-channel rate limit.
+CHANNEL_RATE = 5
+CHANNEL_RATE_PERIOD = 5
 
 # Comms system.
 GARBLE = 10
@@ -29,6 +67,14 @@ PLUS = "<:greenplus:745389551597519061>"
 
 ADMIN_NAME = "<@!366644564137738240>"
 
+# Uploading maps to MAP_DOMAIN (see utils/mapservice.py): how long to wait
+# for the service in seconds, how many times to try, how long to wait before
+# the first retry (doubling each time) and how many connections to keep open.
+MAP_TIMEOUT = 10
+MAP_RETRIES = 3
+MAP_RETRY_DELAY = 0.5
+MAP_CONNECTIONS = 4
+
 # env stuff
 
 from dotenv import load_dotenv
@@ -36,9 +82,8 @@ import os
 
 load_dotenv()
 
+# These are checked when the bot starts (see ALTANTIS/bot.py), rather than
+# here, so that the game can be run headlessly without any of them set.
 MAP_TOKEN = os.getenv('MAP_TOKEN', "")
-assert MAP_TOKEN != ""
 MAP_DOMAIN = os.getenv('MAP_DOMAIN', "")
-assert MAP_DOMAIN != ""
-TOKEN = os.getenv('DISCORD_TOKEN', "")
-assert TOKEN != ""
\ No newline at end of file
+TOKEN = os.getenv('DISCORD_TOKEN', "")
\ No newline at end of file
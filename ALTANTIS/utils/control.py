@@ -4,21 +4,26 @@ A file for useful control and news functionality.
 
 import discord
 
+from ALTANTIS.utils.outbox import outbox
+from ALTANTIS.utils.journal import journalled
+
 control_alerts = None
 news_alerts = None
 
 async def notify_control(event : str):
     if control_alerts:
-        await control_alerts.send(event)
+        outbox.post(control_alerts, event)
 
+@journalled
 def init_control_notifs(channel : discord.TextChannel):
     global control_alerts
     control_alerts = channel
 
 async def notify_news(event : str):
     if news_alerts:
-        await news_alerts.send(event)
+        outbox.post(news_alerts, event)
 
+@journalled
 def init_news_notifs(channel : discord.TextChannel):
     global news_alerts
     news_alerts = channel
\ No newline at end of file
@@ -11,14 +11,10 @@ def diagonal_distance(pa : Tuple[int, int], pb : Tuple[int, int]) -> int:
     """
     Gets manhattan distance with diagonals between points pa and pb.
     I don't know what this is called, but the fastest route is to take the
-    diagonal and then do any excess.
+    diagonal and then do any excess - which comes to the larger of the two
+    distances.
     """
-    (ax, ay) = pa
-    (bx, by) = pb
-    xdist = abs(ax - bx)
-    ydist = abs(ay - by)
-    dist = min(xdist, ydist) + abs(xdist - ydist)
-    return dist
+    return max(abs(pa[0] - pb[0]), abs(pa[1] - pb[1]))
 
 def determine_direction(pa : Tuple[int, int], pb : Tuple[int, int]) -> Optional[str]:
     """
@@ -1,6 +1,8 @@
 from typing import Tuple
 
 class Entity():
+    # Lets NPCs use __slots__ (see npcs/npc.py).
+    __slots__ = ()
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -0,0 +1,91 @@
+"""
+Fast versions of the geometry in utils/direction.py, for inner loops.
+Everything here gives exactly the same answers as diagonal_distance and
+determine_direction - it just works them out once and looks them up, or
+works them out for whole arrays of positions at a time with NumPy.
+"""
+
+import functools
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ALTANTIS.utils.direction import determine_direction
+
+# Directions are looked up for offsets up to this far in either axis, and
+# worked out with determine_direction beyond that.
+DIRECTION_TABLE_RADIUS = 64
+
+def _direction_table(radius : int) -> np.ndarray:
+    # determine_direction only depends on the offset between its points.
+    table = np.empty((2 * radius + 1, 2 * radius + 1), dtype=object)
+    for dx in range(-radius, radius + 1):
+        for dy in range(-radius, radius + 1):
+            table[dx + radius, dy + radius] = determine_direction((0, 0), (dx, dy))
+    return table
+
+DIRECTION_TABLE = _direction_table(DIRECTION_TABLE_RADIUS)
+
+def direction_between(pa : Tuple[int, int], pb : Tuple[int, int]) -> Optional[str]:
+    """
+    The same as determine_direction(pa, pb).
+    """
+    dx = pb[0] - pa[0]
+    dy = pb[1] - pa[1]
+    if -DIRECTION_TABLE_RADIUS <= dx <= DIRECTION_TABLE_RADIUS and -DIRECTION_TABLE_RADIUS <= dy <= DIRECTION_TABLE_RADIUS:
+        return DIRECTION_TABLE[dx + DIRECTION_TABLE_RADIUS, dy + DIRECTION_TABLE_RADIUS]
+    return determine_direction(pa, pb)
+
+def ring(dist : int) -> Tuple[Tuple[int, int], ...]:
+    """
+    The offsets (dx, dy) exactly dist away (a square perimeter), in the order
+    a loop over dx and then dy would give.
+    """
+    if dist == 0:
+        return ((0, 0),)
+    offsets : List[Tuple[int, int]] = []
+    for dx in range(-dist, dist + 1):
+        if abs(dx) == dist:
+            offsets.extend((dx, dy) for dy in range(-dist, dist + 1))
+        else:
+            offsets.append((dx, -dist))
+            offsets.append((dx, dist))
+    return tuple(offsets)
+
+@functools.lru_cache(maxsize=64)
+def ring_offsets(radius : int) -> Tuple[Tuple[Tuple[int, int], ...], ...]:
+    """
+    The offsets at most radius away, grouped by how far away they are:
+    ring_offsets(r)[d] is ring(d).
+    """
+    return tuple(ring(dist) for dist in range(radius + 1))
+
+@functools.lru_cache(maxsize=64)
+def distance_kernel(radius : int) -> np.ndarray:
+    """
+    The distance of each offset from the centre of a (2*radius+1) square,
+    indexed by [dx + radius, dy + radius]. Don't modify it, as it is shared.
+    """
+    offsets = np.abs(np.arange(-radius, radius + 1))
+    kernel = np.maximum(offsets[:, np.newaxis], offsets[np.newaxis, :])
+    kernel.setflags(write=False)
+    return kernel
+
+def distances_from(pos : Tuple[int, int], xs : np.ndarray, ys : np.ndarray) -> np.ndarray:
+    """
+    diagonal_distance from pos to each of the positions (xs[i], ys[i]).
+    """
+    return np.maximum(np.abs(xs - pos[0]), np.abs(ys - pos[1]))
+
+def directions_from(pos : Tuple[int, int], xs : np.ndarray, ys : np.ndarray) -> np.ndarray:
+    """
+    determine_direction from pos to each of the positions (xs[i], ys[i]).
+    """
+    dxs = np.asarray(xs) - pos[0]
+    dys = np.asarray(ys) - pos[1]
+    result = np.empty(dxs.shape, dtype=object)
+    in_table = (np.abs(dxs) <= DIRECTION_TABLE_RADIUS) & (np.abs(dys) <= DIRECTION_TABLE_RADIUS)
+    result[in_table] = DIRECTION_TABLE[dxs[in_table] + DIRECTION_TABLE_RADIUS, dys[in_table] + DIRECTION_TABLE_RADIUS]
+    for i in zip(*np.nonzero(~in_table)):
+        result[i] = determine_direction((0, 0), (int(dxs[i]), int(dys[i])))
+    return result
@@ -0,0 +1,157 @@
+"""
+A write-ahead journal of everything that changes the game between saves, so
+that a crash loses nothing.
+Every state-changing command function (marked with @journalled), every tick and
+every !load is written to the journal (and synced to disk) before it happens,
+along with the random seed it runs with. Each save records how far through the
+journal it was taken, so recovering is just loading the latest save and then
+replaying the journal from there (see recover_game in game.py).
+"""
+
+import asyncio, contextvars, functools, importlib, random
+from typing import Any, Callable, Dict, List
+
+import discord
+
+from ALTANTIS.utils.store import SAVE_DIR, read_committed_lines, append_line
+
+JOURNAL_FILE = f"{SAVE_DIR}/journal.jsonl"
+
+# How many journalled functions we are inside, so that only the outermost one
+# is recorded. This is per task, as commands run concurrently.
+journal_depth : contextvars.ContextVar = contextvars.ContextVar("journal_depth", default=0)
+
+def encode_arg(arg : Any) -> Any:
+    """
+    Makes an argument serialisable. Discord objects are stored by ID.
+    """
+    if isinstance(arg, (list, tuple)):
+        return [encode_arg(item) for item in arg]
+    if isinstance(arg, discord.Guild):
+        return {"guild": arg.id}
+    if isinstance(arg, discord.abc.GuildChannel):
+        return {"channel": arg.id}
+    return arg
+
+def decode_arg(arg : Any, client : discord.Client) -> Any:
+    if isinstance(arg, list):
+        return [decode_arg(item, client) for item in arg]
+    if isinstance(arg, dict) and "guild" in arg:
+        return client.get_guild(arg["guild"])
+    if isinstance(arg, dict) and "channel" in arg:
+        return client.get_channel(arg["channel"])
+    return arg
+
+class Journal():
+    def __init__(self, path : str):
+        self.path = path
+        # Nothing is journalled until the bot enables it, so headless games
+        # (and recovery itself) don't write to it.
+        self.enabled = False
+        self.replaying = False
+        # The sequence number of the last entry written.
+        self.seq = 0
+        # The sequence number of the start entry for this run of the bot, if
+        # it started afresh.
+        self.session_start = None
+
+    def enable(self, fresh : bool):
+        """
+        Starts journalling. If fresh, the game is starting from scratch rather
+        than from recovery, so nothing before now should ever be replayed.
+        """
+        self.load_seq()
+        self.enabled = True
+        if fresh:
+            self.session_start = self.append({"type": "start"})["seq"]
+
+    def load_seq(self):
+        """
+        Catches up with the sequence number of the last entry in the journal.
+        """
+        entries = read_committed_lines(self.path)
+        if len(entries) > 0:
+            self.seq = entries[-1]["seq"]
+
+    def append(self, entry : Dict[str, Any]) -> Dict[str, Any]:
+        self.seq += 1
+        entry["seq"] = self.seq
+        append_line(self.path, entry)
+        return entry
+
+    def recording(self) -> bool:
+        return self.enabled and not self.replaying and journal_depth.get() == 0
+
+    def record_call(self, fn : Callable, args : Any) -> int:
+        """
+        Records a call, and seeds the RNG with the seed it was recorded with.
+        """
+        seed = random.getrandbits(32)
+        self.append({"type": "call", "module": fn.__module__, "name": fn.__name__, "args": encode_arg(args), "seed": seed})
+        random.seed(seed)
+        return seed
+
+    def record_tick(self, counter : int):
+        if self.recording():
+            seed = random.getrandbits(32)
+            self.append({"type": "tick", "counter": counter, "seed": seed})
+            random.seed(seed)
+
+    def record_load(self, which : str, generation : int):
+        if self.recording():
+            self.append({"type": "load", "which": which, "generation": generation})
+
+    def entries_after(self, seq : int) -> List[Dict[str, Any]]:
+        """
+        Everything journalled after the entry with sequence number seq (and
+        before this run of the bot, if it started afresh). If the game was
+        started afresh since seq, this begins at that start entry instead.
+        """
+        entries = [entry for entry in read_committed_lines(self.path) if entry["seq"] > seq]
+        if self.session_start is not None:
+            entries = [entry for entry in entries if entry["seq"] < self.session_start]
+        for i in range(len(entries) - 1, -1, -1):
+            if entries[i]["type"] == "start":
+                return entries[i:]
+        return entries
+
+journal = Journal(JOURNAL_FILE)
+
+def journalled(fn : Callable) -> Callable:
+    """
+    Marks a module-level function as changing the game, so that calls to it
+    are journalled. Its arguments must be serialisable with encode_arg.
+    """
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args):
+            if journal.recording():
+                journal.record_call(fn, args)
+            token = journal_depth.set(journal_depth.get() + 1)
+            try:
+                return await fn(*args)
+            finally:
+                journal_depth.reset(token)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args):
+        if journal.recording():
+            journal.record_call(fn, args)
+        token = journal_depth.set(journal_depth.get() + 1)
+        try:
+            return fn(*args)
+        finally:
+            journal_depth.reset(token)
+    return wrapper
+
+async def replay_call(entry : Dict[str, Any], client : discord.Client):
+    """
+    Reruns a journalled call, with the same seed.
+    """
+    fn = getattr(importlib.import_module(entry["module"]), entry["name"])
+    args = decode_arg(entry["args"], client)
+    random.seed(entry["seed"])
+    result = fn(*args)
+    if asyncio.iscoroutine(result):
+        await result
@@ -0,0 +1,83 @@
+"""
+Uploads drawn maps to the map service at MAP_DOMAIN.
+Every upload goes through one long-lived HTTP client, so connections are
+reused rather than set up for each !map. Uploads of the same map (by team,
+options and turn) are shared: a request made while the same map is still
+uploading waits for that upload, and a request made after it has finished
+gets its URL straight away. A URL is only reused while the map it was
+uploaded for is still what would be drawn.
+"""
+
+import asyncio, hashlib, json
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from ALTANTIS.utils.consts import MAP_DOMAIN, MAP_TOKEN, MAP_TIMEOUT, MAP_RETRIES, MAP_RETRY_DELAY, MAP_CONNECTIONS
+
+class MapService():
+    def __init__(self):
+        self.client : Optional[httpx.AsyncClient] = None
+        # The turn the uploads below are for.
+        self.tick : Optional[int] = None
+        # The (digest, URL) of the last map uploaded this turn, by (team,
+        # options, show_hidden).
+        self.uploaded : Dict[Tuple[Any, ...], Tuple[str, str]] = {}
+        # Uploads in progress, by (team, options, show_hidden, digest).
+        self.uploading : Dict[Tuple[Any, ...], asyncio.Future] = {}
+
+    def get_client(self) -> httpx.AsyncClient:
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                timeout=MAP_TIMEOUT,
+                limits=httpx.Limits(max_connections=MAP_CONNECTIONS, max_keepalive_connections=MAP_CONNECTIONS)
+            )
+        return self.client
+
+    async def post(self, map_string : str, names : str) -> Optional[str]:
+        """
+        Uploads a map, retrying (with backoff) if the service can't be reached
+        or has an error of its own. Returns its URL, or None if it failed.
+        """
+        data = {"map": map_string, "key": MAP_TOKEN, "names": names}
+        for attempt in range(MAP_RETRIES):
+            if attempt > 0:
+                await asyncio.sleep(MAP_RETRY_DELAY * 2 ** (attempt - 1))
+            try:
+                res = await self.get_client().post(MAP_DOMAIN+"/api/map/", data=data)
+                if res.status_code == 200:
+                    return MAP_DOMAIN+res.json()['url']
+                print(f"Map upload failed with status {res.status_code}.")
+                if res.status_code < 500:
+                    # Our fault, so trying again won't help.
+                    return None
+            except Exception as e:
+                print(e)
+        return None
+
+    async def upload(self, key : Tuple[Any, ...], tick : int, map_string : str, map_arr : List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Gets a URL for the map drawn for key on turn tick, uploading it if
+        it hasn't been already.
+        """
+        if tick != self.tick:
+            self.tick = tick
+            self.uploaded = {}
+        names = json.dumps(map_arr)
+        digest = hashlib.sha1(f"{map_string}\n{names}".encode("utf-8")).hexdigest()
+        if key in self.uploaded and self.uploaded[key][0] == digest:
+            return self.uploaded[key][1]
+
+        flight = key + (digest,)
+        if flight not in self.uploading:
+            upload = asyncio.ensure_future(self.post(map_string, names))
+            self.uploading[flight] = upload
+            upload.add_done_callback(lambda _: self.uploading.pop(flight, None))
+        # Shielded, so one request being cancelled doesn't cancel the upload
+        # for everyone else waiting on it.
+        url = await asyncio.shield(self.uploading[flight])
+        if url is not None and self.tick == tick:
+            self.uploaded[key] = (digest, url)
+        return url
+
+map_service = MapService()
@@ -0,0 +1,155 @@
+"""
+Sends messages to Discord in the background, so that nothing (particularly the
+tick) has to wait on a round trip to Discord.
+Each channel has its own queue and worker, so different channels are sent to
+concurrently. A worker packs everything waiting for its channel into as few
+posts as it can, and keeps within that channel's rate limit.
+As senders don't wait, they can't see whether a send failed - instead, how
+long delivery takes and how many posts failed are shown in !tickstats.
+"""
+
+import asyncio, time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import discord
+
+from ALTANTIS.utils.consts import MESSAGE_LIMIT, CHANNEL_RATE, CHANNEL_RATE_PERIOD
+from ALTANTIS.utils.profiler import tick_profiler
+
+def split_message(content : str, limit : int = MESSAGE_LIMIT) -> List[str]:
+    """
+    Splits a message into pieces no longer than limit, breaking between lines
+    where possible.
+    """
+    if len(content) <= limit:
+        return [content]
+    pieces = []
+    current = ""
+    for line in content.split("\n"):
+        while len(line) > limit:
+            if current != "":
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:limit])
+            line = line[limit:]
+        if current == "":
+            current = line
+        elif len(current) + 1 + len(line) <= limit:
+            current += "\n" + line
+        else:
+            pieces.append(current)
+            current = line
+    if current != "":
+        pieces.append(current)
+    return pieces
+
+def pack_messages(messages : List[Tuple[str, Optional[str]]], limit : int = MESSAGE_LIMIT) -> List[Tuple[str, Optional[str]]]:
+    """
+    Packs (content, filename) pairs into as few posts as possible, keeping
+    their order. A message with a file attached ends the post it is in.
+    """
+    posts : List[Tuple[str, Optional[str]]] = []
+    current = ""
+    for (content, filename) in messages:
+        pieces = split_message(content, limit)
+        for piece in pieces:
+            if current == "":
+                current = piece
+            elif len(current) + 1 + len(piece) <= limit:
+                current += "\n" + piece
+            else:
+                posts.append((current, None))
+                current = piece
+        if filename is not None:
+            posts.append((current, filename))
+            current = ""
+    if current != "":
+        posts.append((current, None))
+    return posts
+
+class Outbox():
+    def __init__(self):
+        # Messages waiting to be sent (with when they were queued), by channel ID.
+        self.queues : Dict[int, Deque[Tuple[str, Optional[str], float]]] = {}
+        self.channels : Dict[int, Any] = {}
+        self.workers : Dict[int, asyncio.Task] = {}
+        # When we last posted to each channel, for rate limiting.
+        self.sent : Dict[int, Deque[float]] = {}
+        self.rate = CHANNEL_RATE
+        self.period = CHANNEL_RATE_PERIOD
+        # While muted (say, while replaying the journal), posts are dropped.
+        self.muted = False
+
+    def set_rate_limit(self, rate : int, period : float):
+        """
+        Allows at most rate posts per channel every period seconds. A period
+        of zero turns rate limiting off.
+        """
+        self.rate = rate
+        self.period = period
+        self.sent = {key: deque(maxlen=rate) for key in self.queues}
+
+    def post(self, channel : Any, content : str, filename : Optional[str] = None):
+        """
+        Queues content (and optionally the file at filename) to be sent to
+        channel, and returns immediately.
+        """
+        if self.muted:
+            return
+        key = channel.id
+        if key not in self.queues:
+            self.queues[key] = deque()
+            self.sent[key] = deque(maxlen=self.rate)
+        self.channels[key] = channel
+        self.queues[key].append((content, filename, time.perf_counter()))
+        if key not in self.workers or self.workers[key].done():
+            self.workers[key] = asyncio.get_event_loop().create_task(self.deliver(key))
+
+    async def deliver(self, key : int):
+        """
+        Sends everything queued for a channel, finishing once its queue is empty.
+        Records how long each post took to send, and how long the messages in
+        it waited from being queued to being delivered.
+        """
+        queue = self.queues[key]
+        while len(queue) > 0:
+            waiting = list(queue)
+            queue.clear()
+            queued_at = waiting[0][2]
+            for (content, filename) in pack_messages([(content, filename) for (content, filename, _) in waiting]):
+                await self.wait_for_rate_limit(key)
+                send_start = time.perf_counter()
+                try:
+                    fp = None
+                    if filename:
+                        fp = discord.File(filename)
+                    await self.channels[key].send(content, file=fp)
+                except Exception as e:
+                    print(e)
+                    tick_profiler.count("failed posts")
+                sent_at = time.perf_counter()
+                tick_profiler.add_sample("outbox", "send", sent_at - send_start, 0.0)
+                tick_profiler.add_sample("outbox", "delivery", sent_at - queued_at, 0.0)
+
+    async def wait_for_rate_limit(self, key : int):
+        if self.period <= 0:
+            return
+        sent = self.sent[key]
+        if len(sent) == self.rate:
+            wait = sent[0] + self.period - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        sent.append(time.monotonic())
+
+    async def drain(self):
+        """
+        Waits until everything queued so far has been sent.
+        """
+        # Finished workers may belong to an old event loop (say, a previous
+        # headless run), which gather would refuse.
+        workers = [worker for worker in self.workers.values() if not worker.done()]
+        if len(workers) > 0:
+            await asyncio.gather(*workers)
+
+outbox = Outbox()
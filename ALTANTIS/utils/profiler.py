@@ -0,0 +1,155 @@
+"""
+Keeps rolling timings of each phase of the tick, along with each submarine and
+each type of NPC, so control can see (with !tickstats) what is eating into
+GAME_SPEED as the game grows.
+"""
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Tuple
+
+from ALTANTIS.utils.consts import PROFILE_WINDOW
+
+def percentile(values : List[float], p : float) -> float:
+    """
+    The nearest-rank p-th percentile (for 0 <= p <= 1) of some values.
+    """
+    if len(values) == 0:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(p * len(ordered)))
+    return ordered[index]
+
+class Samples():
+    """
+    The last few wall-clock and CPU timings (in seconds) of one thing.
+    """
+    def __init__(self, window : int):
+        self.wall : Deque[float] = deque(maxlen=window)
+        self.cpu : Deque[float] = deque(maxlen=window)
+
+    def add(self, wall : float, cpu : float):
+        self.wall.append(wall)
+        self.cpu.append(cpu)
+
+    def summary(self) -> Tuple[float, float, float, float]:
+        """
+        Gives (p50, p95, max, CPU p50) of these timings.
+        """
+        wall = list(self.wall)
+        return (percentile(wall, 0.5), percentile(wall, 0.95), max(wall, default=0.0), percentile(list(self.cpu), 0.5))
+
+class TickProfiler():
+    """
+    Timings are grouped into categories ("phase", "sub", "npc", "save" and
+    "outbox"), and within those by key (the phase name, the sub name, the NPC
+    classname and the stage of saving or sending).
+    Everything measured during a tick is summed up, and only becomes a sample
+    once the tick ends - so a sub's sample is its total time across all phases.
+    There are also running counts of things that aren't timings, like how many
+    posts have failed to send.
+    """
+    def __init__(self, window : int):
+        self.window = window
+        self.samples : Dict[str, Dict[str, Samples]] = {}
+        self.current : Dict[str, Dict[str, List[float]]] = {}
+        self.counts : Dict[str, int] = {}
+
+    def reset(self, window : int):
+        self.__init__(window)
+
+    def start_tick(self):
+        self.current = {}
+
+    def end_tick(self) -> Dict[str, float]:
+        """
+        Turns this tick's totals into samples, and returns how long each phase
+        took (in seconds).
+        """
+        for category in self.current:
+            for key in self.current[category]:
+                (wall, cpu) = self.current[category][key]
+                self.add_sample(category, key, wall, cpu)
+        phases = {name: totals[0] for (name, totals) in self.current.get("phase", {}).items()}
+        self.current = {}
+        return phases
+
+    def add_sample(self, category : str, key : str, wall : float, cpu : float):
+        if category not in self.samples:
+            self.samples[category] = {}
+        if key not in self.samples[category]:
+            self.samples[category][key] = Samples(self.window)
+        self.samples[category][key].add(wall, cpu)
+
+    def count(self, name : str, amount : int = 1):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    @contextmanager
+    def measure(self, category : str, key : str) -> Iterator[None]:
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            if category not in self.current:
+                self.current[category] = {}
+            totals = self.current[category].setdefault(key, [0.0, 0.0])
+            totals[0] += time.perf_counter() - wall_start
+            totals[1] += time.thread_time() - cpu_start
+
+    def phase(self, name : str):
+        return self.measure("phase", name)
+
+    def sub(self, name : str):
+        return self.measure("sub", name)
+
+    def npc(self, classname : str):
+        return self.measure("npc", classname)
+
+    def stats(self, category : str) -> List[Tuple[str, float, float, float, float]]:
+        """
+        Gives (key, p50, p95, max, CPU p50) for everything in a category, in
+        the order they were first seen.
+        """
+        results = []
+        for (key, samples) in self.samples.get(category, {}).items():
+            results.append((key, *samples.summary()))
+        return results
+
+    def ticks_timed(self) -> int:
+        phases = self.samples.get("phase", {})
+        if len(phases) == 0:
+            return 0
+        return max(map(lambda samples: len(samples.wall), phases.values()))
+
+    def table(self, slowest : int = 5) -> str:
+        """
+        A table of timings (in milliseconds). Phases are listed in tick order,
+        then the slowest few subs and types of NPC (by p95), saving and sending
+        messages, and finally any counts.
+        """
+        phases = self.stats("phase")
+        lines = [f"{'':<12}{'p50':>9}{'p95':>9}{'max':>9}{'cpu p50':>9}"]
+        def add_rows(title : str, rows : List[Tuple[str, float, float, float, float]]):
+            lines.append(title)
+            for (key, p50, p95, worst, cpu) in rows:
+                lines.append(f"{key[:12]:<12}{p50*1000:>9.2f}{p95*1000:>9.2f}{worst*1000:>9.2f}{cpu*1000:>9.2f}")
+        def by_p95(rows):
+            return sorted(rows, key=lambda row: row[2], reverse=True)[:slowest]
+        add_rows("Phases", phases)
+        for (category, title) in [("sub", "Slowest submarines"), ("npc", "Slowest NPC types"), ("save", "Saving"), ("outbox", "Sending messages")]:
+            rows = self.stats(category)
+            if len(rows) > 0:
+                add_rows(title, by_p95(rows))
+        for (name, amount) in self.counts.items():
+            lines.append(f"{name}: {amount}")
+        return "\n".join(lines)
+
+    def report(self) -> str:
+        ticks = self.ticks_timed()
+        if ticks == 0:
+            return "No ticks have been timed yet."
+        return f"Timings (ms) over the last {ticks} ticks:\n```\n{self.table()}\n```"
+
+tick_profiler = TickProfiler(PROFILE_WINDOW)
@@ -0,0 +1,338 @@
+"""
+Stores saves as content-addressed chunks, so that a save only writes what has
+changed since the saves before it.
+The map is split into square blocks of cells, the state into one chunk per
+sub and the NPCs into batches by ID. Each chunk is named by the SHA-1 of its
+contents, and only chunks that haven't been seen before are written. Each
+save then gets a small manifest saying which chunks make it up.
+Saves are only committed once they are listed in the index, an append-only
+file with one line per save. Every file is written to a temporary file and
+then renamed into place, so a crash never leaves a half-written file behind.
+Games saved before this (as whole files in saves/map, saves/state and
+saves/npc) are moved into the store the first time the index is read, if
+there is no index yet.
+"""
+
+import gzip, hashlib, json, os, time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ALTANTIS.utils.consts import SAVE_CHUNK_SIZE, NPC_CHUNK_SIZE
+
+SAVE_DIR = "saves"
+CHUNK_DIR = f"{SAVE_DIR}/chunks"
+MANIFEST_DIR = f"{SAVE_DIR}/manifests"
+INDEX_FILE = f"{SAVE_DIR}/index.jsonl"
+# Where each part of a save went before the chunk store.
+LEGACY_DIRS = {"map": f"{SAVE_DIR}/map", "state": f"{SAVE_DIR}/state", "npcs": f"{SAVE_DIR}/npc"}
+
+def write_atomically(path : str, data : bytes):
+    """
+    Writes data to path, such that path either has all of it or is untouched.
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as temp_file:
+        temp_file.write(data)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+    os.replace(temp_path, path)
+
+def sync_directory(directory : str):
+    """
+    Makes sure renames into a directory have hit the disk.
+    """
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def read_committed_lines(path : str) -> List[Any]:
+    """
+    Reads a file of one JSON object per line, which is only ever appended to.
+    A line torn by a crash (without its newline) never committed, so it is cut
+    off before anything is appended after it.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb+") as lines_file:
+        data = lines_file.read()
+        committed = data.rfind(b"\n") + 1
+        if committed < len(data):
+            lines_file.truncate(committed)
+    return [json.loads(line) for line in data[:committed].splitlines()]
+
+def append_line(path : str, entry : Dict[str, Any]):
+    """
+    Appends entry to a file of one JSON object per line, and waits for it to
+    hit the disk.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as lines_file:
+        lines_file.write(json.dumps(entry) + "\n")
+        lines_file.flush()
+        os.fsync(lines_file.fileno())
+
+class ChunkStore():
+    """
+    Only used from one thread at a time (the save thread when saving, and the
+    event loop when loading).
+    """
+    def __init__(self, directory : str):
+        self.directory = directory
+        # The chunks we know are on disk, with their (compressed) sizes.
+        # Filled in lazily.
+        self.known : Dict[str, int] = {}
+        self.listed = False
+
+    def path(self, digest : str) -> str:
+        return f"{self.directory}/{digest}.json.gz"
+
+    def list_chunks(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for filename in os.listdir(self.directory):
+            path = f"{self.directory}/{filename}"
+            if filename.endswith(".tmp"):
+                # Left over from a crash mid-write.
+                os.remove(path)
+            else:
+                self.known[filename.split(".")[0]] = os.path.getsize(path)
+        self.listed = True
+
+    def put(self, data : Any) -> str:
+        """
+        Writes data as a chunk if we don't have it already, returning its name.
+        """
+        if not self.listed:
+            self.list_chunks()
+        encoded = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha1(encoded).hexdigest()
+        if digest not in self.known:
+            compressed = gzip.compress(encoded)
+            write_atomically(self.path(digest), compressed)
+            self.known[digest] = len(compressed)
+        return digest
+
+    def size(self, digests : List[str]) -> int:
+        return sum(self.known.get(digest, 0) for digest in digests)
+
+    def get(self, digest : str) -> Any:
+        with gzip.open(self.path(digest), "rb") as chunk_file:
+            return json.loads(chunk_file.read())
+
+chunks = ChunkStore(CHUNK_DIR)
+
+def put_map(map_dict : Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Splits a map made by map_to_dict into blocks of SAVE_CHUNK_SIZE x
+    SAVE_CHUNK_SIZE cells and stores them. Blocks of normal water aren't
+    stored at all.
+    """
+    blocks : Dict[Tuple[int, int], List[Any]] = {}
+    for stored in map_dict["cells"]:
+        blocks.setdefault((stored[0] // SAVE_CHUNK_SIZE, stored[1] // SAVE_CHUNK_SIZE), []).append(stored)
+    return {
+        "x_limit": map_dict["x_limit"],
+        "y_limit": map_dict["y_limit"],
+        "tick": map_dict["tick"],
+        "seed": map_dict["seed"],
+        "chunk_size": SAVE_CHUNK_SIZE,
+        "blocks": [[bx, by, chunks.put(blocks[(bx, by)])] for (bx, by) in sorted(blocks)]
+    }
+
+def get_map(manifest : Dict[str, Any]) -> Dict[str, Any]:
+    x_limit = manifest["x_limit"]
+    y_limit = manifest["y_limit"]
+    if "blocks" in manifest:
+        stored = []
+        for (_, _, digest) in manifest["blocks"]:
+            stored.extend(chunks.get(digest))
+        return {"cells": stored, "x_limit": x_limit, "y_limit": y_limit, "tick": manifest.get("tick", 0), "seed": manifest.get("seed", 0)}
+    # Saves from before the map was sparse chunk every square.
+    size = manifest["chunk_size"]
+    dense : List[List[Dict[str, Any]]] = [[] for _ in range(x_limit)]
+    for (i, column) in enumerate(manifest["chunks"]):
+        for digest in column:
+            block = chunks.get(digest)
+            for (offset, block_column) in enumerate(block):
+                dense[i * size + offset].extend(block_column)
+    return {"map": dense, "x_limit": x_limit, "y_limit": y_limit}
+
+def put_dense_map(map_dict : Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Stores a map in the dense form older saves used (where "map" holds every
+    square), as the columns of chunks get_map reads back.
+    """
+    dense = map_dict["map"]
+    size = SAVE_CHUNK_SIZE
+    columns = []
+    for x in range(0, map_dict["x_limit"], size):
+        columns.append([chunks.put([column[y:y + size] for column in dense[x:x + size]]) for y in range(0, map_dict["y_limit"], size)])
+    return {"x_limit": map_dict["x_limit"], "y_limit": map_dict["y_limit"], "chunk_size": size, "chunks": columns}
+
+def put_state(state_dict : Dict[str, Any]) -> Dict[str, str]:
+    return {subname: chunks.put(state_dict[subname]) for subname in state_dict}
+
+def get_state(manifest : Dict[str, str]) -> Dict[str, Any]:
+    return {subname: chunks.get(manifest[subname]) for subname in manifest}
+
+def put_npcs(npcs_dict : Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Batches NPCs by ID, so adding or killing one only changes its own batch.
+    Each NPC is a row of its classname and then its fields, in the order of
+    the schema of its class (see npcs_to_json), which the manifest keeps.
+    """
+    schemas = npcs_dict["schemas"]
+    # Where the ID is in the rows of each class.
+    id_columns = {name: fields.index("id") + 1 for (name, fields) in schemas.items()}
+    batches : Dict[int, List[Any]] = {}
+    for npc in npcs_dict["npcs"]:
+        batches.setdefault(npc[id_columns[npc[0]]] // NPC_CHUNK_SIZE, []).append(npc)
+    return {"counter": npcs_dict["counter"], "schemas": schemas, "chunks": [chunks.put(batches[batch]) for batch in sorted(batches)]}
+
+def put_npc_dicts(npcs_dict : Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Batches NPCs saved as a dictionary each (as older saves did) by ID.
+    """
+    batches : Dict[int, List[Any]] = {}
+    for npc in npcs_dict["npcs"]:
+        batches.setdefault(npc["id"] // NPC_CHUNK_SIZE, []).append(npc)
+    return {"counter": npcs_dict["counter"], "chunks": [chunks.put(batches[batch]) for batch in sorted(batches)]}
+
+def get_npcs(manifest : Dict[str, Any]) -> Dict[str, Any]:
+    npcs = []
+    for digest in manifest["chunks"]:
+        npcs.extend(chunks.get(digest))
+    if "schemas" in manifest:
+        return {"npcs": npcs, "schemas": manifest["schemas"], "counter": manifest["counter"]}
+    # Older saves have a dictionary for each NPC.
+    return {"npcs": npcs, "counter": manifest["counter"]}
+
+class SaveIndex():
+    """
+    Every committed save, oldest first, as kept in INDEX_FILE. Each entry has
+    the save's generation (counting up from 0), its manifest file, the tick it
+    was taken after, when it was taken and how big each part of it is.
+    Entries are appended by the save thread and read by the event loop.
+    """
+    def __init__(self, path : str):
+        self.path = path
+        self.entries : List[Dict[str, Any]] = []
+        self.loaded = False
+
+    def load(self):
+        if not os.path.exists(self.path) and os.path.isdir(LEGACY_DIRS["map"]):
+            # Migrating appends to the index, which is empty until then.
+            self.loaded = True
+            migrate_legacy_saves()
+        self.entries = read_committed_lines(self.path)
+        self.loaded = True
+
+    def next_generation(self) -> int:
+        if not self.loaded:
+            self.load()
+        if len(self.entries) == 0:
+            return 0
+        return self.entries[-1]["generation"] + 1
+
+    def append(self, entry : Dict[str, Any]):
+        if not self.loaded:
+            self.load()
+        append_line(self.path, entry)
+        self.entries.append(entry)
+
+    def get(self, offset : int) -> Optional[Dict[str, Any]]:
+        """
+        The save offset saves back from the latest (which is offset 0).
+        """
+        if not self.loaded:
+            self.load()
+        if offset < 0 or offset >= len(self.entries):
+            return None
+        return self.entries[-1 - offset]
+
+    def by_generation(self, generation : int) -> Optional[Dict[str, Any]]:
+        if not self.loaded:
+            self.load()
+        # Generations count up from 0, so this is normally where it is.
+        if 0 <= generation < len(self.entries) and self.entries[generation]["generation"] == generation:
+            return self.entries[generation]
+        for entry in reversed(self.entries):
+            if entry["generation"] == generation:
+                return entry
+        return None
+
+save_index = SaveIndex(INDEX_FILE)
+
+def write_snapshot(tick : Optional[int], journal_seq : int, state_dict : Dict[str, Any], map_dict : Dict[str, Any], npcs_dict : Dict[str, Any]):
+    """
+    Stores the chunks of a save, then its manifest, and finally commits it to
+    the index. Anything written before a crash that never made it into the
+    index is ignored.
+    """
+    commit_manifest({
+        "tick": tick,
+        "journal": journal_seq,
+        "state": put_state(state_dict),
+        "map": put_map(map_dict),
+        "npcs": put_npcs(npcs_dict)
+    }, time.strftime("%Y-%m-%d %H:%M:%S"))
+
+def commit_manifest(manifest : Dict[str, Any], timestamp : str):
+    """
+    Writes the manifest of a save whose chunks are stored, and then commits it
+    to the index.
+    """
+    generation = save_index.next_generation()
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    manifest_file = f"{generation:08d}.json"
+    manifest_data = json.dumps(manifest).encode("utf-8")
+    write_atomically(f"{MANIFEST_DIR}/{manifest_file}", manifest_data)
+    sync_directory(CHUNK_DIR)
+    sync_directory(MANIFEST_DIR)
+    if "blocks" in manifest["map"]:
+        map_chunks = [digest for (_, _, digest) in manifest["map"]["blocks"]]
+    else:
+        map_chunks = [digest for column in manifest["map"]["chunks"] for digest in column]
+    save_index.append({
+        "generation": generation,
+        "manifest": manifest_file,
+        "tick": manifest["tick"],
+        "journal": manifest["journal"],
+        "timestamp": timestamp,
+        "sizes": {
+            "manifest": len(manifest_data),
+            "state": chunks.size(list(manifest["state"].values())),
+            "map": chunks.size(map_chunks),
+            "npcs": chunks.size(manifest["npcs"]["chunks"])
+        }
+    })
+
+def read_manifest(entry : Dict[str, Any]) -> Dict[str, Any]:
+    with open(f"{MANIFEST_DIR}/{entry['manifest']}") as manifest_file:
+        return json.load(manifest_file)
+
+def read_legacy_part(part : str, filename : str) -> Any:
+    with gzip.open(f"{LEGACY_DIRS[part]}/{filename}", "rb") as part_file:
+        return json.loads(part_file.read())
+
+def migrate_legacy_saves():
+    """
+    Moves every save in the old layout (a file per part, named by when it was
+    taken) into the chunk store, oldest first, so they can be loaded by offset
+    like any other. The old files are left where they are. Saves missing a
+    part, or with a part that can't be read (say, from a crash mid-write),
+    are skipped.
+    """
+    for filename in sorted(os.listdir(LEGACY_DIRS["map"])):
+        try:
+            (map_dict, state_dict, npcs_dict) = (read_legacy_part(part, filename) for part in ("map", "state", "npcs"))
+        except Exception as e:
+            print(e)
+            continue
+        commit_manifest({
+            "tick": None,
+            "journal": 0,
+            "state": put_state(state_dict),
+            "map": put_dense_map(map_dict),
+            "npcs": put_npc_dicts(npcs_dict)
+        }, filename.split(".")[0])
@@ -3,6 +3,16 @@
 ATTRIBUTES = ["deposit", "diverse", "hiddenness", "weather", "docking", "obstacle", "ruins", "junk", "wallstyle", "name"]
 # A mapping of the permissible weather states and their map characters.
 WEATHER = {"calm": "C", "normal": ".", "rough": "R", "stormy": "S"}
+# How each weather is stored in the weather layer (see world/layers.py), and
+# the code for squares a weather fill should leave alone.
+WEATHER_CODES = {"normal": 0, "calm": 1, "rough": 2, "stormy": 3}
+WEATHER_KEEP = 255
+# Treasure that appears by itself in squares with these attributes (one item,
+# chosen at random), and the chance of that happening each turn.
+SPAWNS = {"deposit": ["plating"], "diverse": ["specimen"], "ruins": ["tool", "circuitry"]}
+SPAWN_CHANCE = 0.015
+# The chance each turn that a hidden square a sub has explored becomes hidden again.
+EXPLORED_RESET_CHANCE = 0.01
 # A list of characters able to be used for wall alternate styles (such as in bases)
 WALL_STYLES = ["b", "h", "z", "v", "p", "l"]
 
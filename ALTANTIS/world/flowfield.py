@@ -0,0 +1,89 @@
+"""
+Lets hunting NPCs chase subs without each of them looking for subs nearby.
+A breadth-first search out from every sub at once gives how many steps each
+square near a sub is from the closest one, going around walls and docking
+stations (which NPCs can't enter). A hunter then just steps to a neighbouring
+square one step closer. The search is only redone when a sub moves or a
+square becomes (or stops being) blocked, so it is shared by every hunter in
+a turn.
+"""
+
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from ALTANTIS.utils.direction import go_in_direction, rotate_direction
+from ALTANTIS.utils.geometry import ring, direction_between
+from ALTANTIS.world.layers import layers
+from ALTANTIS.world.spatial import sub_index
+
+# The eight steps an NPC can take.
+STEPS = list(ring(1))
+
+class FlowField():
+    """
+    How many steps (up to max_steps) each square is from the closest sub,
+    and where that sub is.
+    """
+    def __init__(self, max_steps : int):
+        self.max_steps = max_steps
+        self.stamp : Optional[Tuple[int, int, int]] = None
+        self.steps : Dict[Tuple[int, int], int] = {}
+        self.sources : Dict[Tuple[int, int], Tuple[int, int]] = {}
+
+    def refresh(self):
+        stamp = (sub_index.version, layers.generation, layers.blocked_changes)
+        if stamp == self.stamp:
+            return
+        self.stamp = stamp
+        (x_limit, y_limit) = layers.blocked.shape
+        self.steps = {}
+        self.sources = {}
+        frontier : Deque[Tuple[int, int]] = deque()
+        for (x, y) in sorted(sub_index.occupied()):
+            if 0 <= x < x_limit and 0 <= y < y_limit:
+                self.steps[(x, y)] = 0
+                self.sources[(x, y)] = (x, y)
+                frontier.append((x, y))
+        while len(frontier) > 0:
+            pos = frontier.popleft()
+            steps = self.steps[pos] + 1
+            if steps > self.max_steps:
+                continue
+            for (dx, dy) in STEPS:
+                (x, y) = (pos[0] + dx, pos[1] + dy)
+                if not (0 <= x < x_limit and 0 <= y < y_limit) or (x, y) in self.steps or layers.blocked[x, y]:
+                    continue
+                self.steps[(x, y)] = steps
+                self.sources[(x, y)] = self.sources[pos]
+                frontier.append((x, y))
+
+    def towards_sub(self, pos : Tuple[int, int], max_steps : int) -> List[Tuple[int, int]]:
+        """
+        The steps from pos that get one step closer to the closest sub, if it
+        is at most max_steps away. Heading straight for the sub comes first,
+        then the directions either side of that.
+        """
+        self.refresh()
+        steps = self.steps.get(pos)
+        if steps is None or steps == 0 or steps > max_steps:
+            return []
+        preferred : List[Tuple[int, int]] = []
+        direction = direction_between(pos, self.sources[pos])
+        if direction is not None:
+            preferred.append(go_in_direction(direction))
+            rotated = rotate_direction(direction)
+            if rotated is not None:
+                preferred.extend([go_in_direction(rotated[0]), go_in_direction(rotated[1])])
+        closer = []
+        for (dx, dy) in preferred + STEPS:
+            if self.steps.get((pos[0] + dx, pos[1] + dy)) == steps - 1 and (dx, dy) not in closer:
+                closer.append((dx, dy))
+        return closer
+
+# Flow fields by how far they search.
+flow_fields : Dict[int, FlowField] = {}
+
+def flow_field(max_steps : int) -> FlowField:
+    if max_steps not in flow_fields:
+        flow_fields[max_steps] = FlowField(max_steps)
+    return flow_fields[max_steps]
@@ -0,0 +1,165 @@
+"""
+Keeps the parts of the map that scanning needs as NumPy arrays (indexed by
+[x, y]), so a scan can find the squares worth reporting with a few array
+operations instead of looking at every square in range.
+Every change to a square (including to who has explored it, and when its next
+spawn is) goes through Cell._changed, which updates these and counts the
+change in the version layer, so anything worked out from a part of the map
+can tell whether any of it has changed since.
+Who has explored each hidden square is kept here too, as one bitmap per sub,
+along with the turn each square's exploration runs out. Exploration that has
+run out is ignored rather than cleared, until the square is next explored.
+"""
+
+from typing import Collection, Dict, List, Tuple
+
+import numpy as np
+
+from ALTANTIS.world.consts import WEATHER_CODES
+
+# Bits of the features layer.
+STORM = 1
+DIVERSE = 2
+RUINS = 4
+JUNK = 8
+DEPOSIT = 16
+DOCKING = 32
+
+FEATURE_ATTRIBUTES = {"diverse": DIVERSE, "ruins": RUINS, "junk": JUNK, "deposit": DEPOSIT, "docking": DOCKING}
+
+# The due layer's value for squares with nothing due.
+NO_EVENT = np.iinfo(np.int64).max
+
+class Layers():
+    def __init__(self):
+        # Counts resets, so versions from before a reset are never mistaken for
+        # versions after it.
+        self.generation = 0
+        self.reset(0, 0)
+
+    def reset(self, x_limit : int, y_limit : int):
+        """
+        Empties the layers, for a map of normal water of the given size.
+        """
+        self.hiddenness = np.zeros((x_limit, y_limit), dtype=np.uint8)
+        self.treasure = np.zeros((x_limit, y_limit), dtype=np.uint16)
+        self.features = np.zeros((x_limit, y_limit), dtype=np.uint8)
+        # The weather of each square, by WEATHER_CODES.
+        self.weather = np.zeros((x_limit, y_limit), dtype=np.uint8)
+        # Whether NPCs are kept out of each square (walls and docking stations).
+        self.blocked = np.zeros((x_limit, y_limit), dtype=bool)
+        self.version = np.zeros((x_limit, y_limit), dtype=np.uint32)
+        # The turn each square next has a spawn due.
+        self.due = np.full((x_limit, y_limit), NO_EVENT, dtype=np.int64)
+        # The squares each sub has explored, by sub name.
+        self.explored : Dict[str, np.ndarray] = {}
+        # The turn each square's exploration runs out (and it is hidden from
+        # everyone again). Exploration is only current before then.
+        self.explored_until = np.zeros((x_limit, y_limit), dtype=np.int64)
+        self.generation += 1
+        # Counts changes to any square, and to which squares are blocked.
+        self.changes = 0
+        self.blocked_changes = 0
+
+    def update(self, cell):
+        """
+        Copies a square's current state into the layers.
+        """
+        (x, y) = (cell.x, cell.y)
+        if not (0 <= x < self.features.shape[0] and 0 <= y < self.features.shape[1]):
+            return
+        attributes = cell.attributes
+        self.hiddenness[x, y] = attributes.get("hiddenness", 0)
+        self.treasure[x, y] = min(len(cell.treasure), np.iinfo(np.uint16).max)
+        self.weather[x, y] = WEATHER_CODES.get(attributes.get("weather", "normal"), 0)
+        features = STORM if attributes.get("weather", "normal") == "stormy" else 0
+        for attr in FEATURE_ATTRIBUTES:
+            if attr in attributes:
+                features |= FEATURE_ATTRIBUTES[attr]
+        self.features[x, y] = features
+        blocked = "obstacle" in attributes or "docking" in attributes
+        if blocked != self.blocked[x, y]:
+            self.blocked[x, y] = blocked
+            self.blocked_changes += 1
+        self.due[x, y] = min(cell.next_event.values(), default=NO_EVENT)
+        self.version[x, y] += 1
+        self.changes += 1
+
+    def in_bounds(self, x : int, y : int) -> bool:
+        return 0 <= x < self.explored_until.shape[0] and 0 <= y < self.explored_until.shape[1]
+
+    def explore(self, x : int, y : int, name : str):
+        """
+        Records that a sub has explored a square (whose exploration must be
+        current - see start_exploring).
+        """
+        if not self.in_bounds(x, y):
+            return
+        if name not in self.explored:
+            self.explored[name] = np.zeros(self.explored_until.shape, dtype=bool)
+        self.explored[name][x, y] = True
+
+    def start_exploring(self, x : int, y : int, until : int):
+        """
+        Forgets who explored a square before, so it can be explored afresh
+        until the given turn.
+        """
+        self.clear_explored(x, y)
+        if self.in_bounds(x, y):
+            self.explored_until[x, y] = until
+
+    def clear_explored(self, x : int, y : int):
+        if not self.in_bounds(x, y):
+            return
+        for bitmap in self.explored.values():
+            bitmap[x, y] = False
+        self.explored_until[x, y] = 0
+
+    def explorers(self, x : int, y : int, tick : int) -> List[str]:
+        """
+        The subs whose exploration of a square is current.
+        """
+        if not self.in_bounds(x, y) or tick >= self.explored_until[x, y]:
+            return []
+        return sorted(name for (name, bitmap) in self.explored.items() if bitmap[x, y])
+
+    def is_explored(self, x : int, y : int, names : Collection[str], tick : int) -> bool:
+        """
+        Whether any of the subs has currently explored a square.
+        """
+        if not self.in_bounds(x, y) or tick >= self.explored_until[x, y]:
+            return False
+        return any(self.explored[name][x, y] for name in names if name in self.explored)
+
+    def explored_by(self, names : Collection[str], tick : int) -> np.ndarray:
+        """
+        Which squares any of the subs has currently explored.
+        """
+        seen = np.zeros(self.explored_until.shape, dtype=bool)
+        for name in names:
+            if name in self.explored:
+                seen |= self.explored[name]
+        return seen & (self.explored_until > tick)
+
+    def due_squares(self, tick : int) -> List[Tuple[int, int]]:
+        """
+        The squares with a spawn due by tick.
+        """
+        return [(int(x), int(y)) for (x, y) in np.argwhere(self.due <= tick)]
+
+    def window_version(self, xs : slice, ys : slice) -> int:
+        """
+        Changes whenever any square in the window does, as versions only ever
+        go up.
+        """
+        return int(self.version[xs, ys].sum(dtype=np.uint64))
+
+    def broadcasting(self, xs : slice, ys : slice) -> np.ndarray:
+        """
+        Which squares in the window have something to show a scan, ignoring
+        hiddenness. Squares that spawn treasure always have a feature set, so
+        treasure they haven't caught up on yet doesn't matter.
+        """
+        return (self.features[xs, ys] != 0) | (self.treasure[xs, ys] > 0)
+
+layers = Layers()
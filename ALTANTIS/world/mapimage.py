@@ -0,0 +1,163 @@
+"""
+Draws the map as a PNG ourselves, for when there is no map service (or it is
+down - see print_map in cogs/status.py).
+Each character of the map drawn by draw_map stands for what a square looks
+like, so each gets a tile (made once, and then reused for every square drawn
+that way). Sub markers get their number drawn on them. The image is put
+together from the tiles with NumPy and compressed on a worker thread, so the
+event loop isn't held up. Images are cached by the map they show, and
+requests for a map that is already being drawn wait for that one.
+The names the map service would show when hovering over a square (docking
+stations, NPCs, treasure and so on) can't go in the image, so they are listed
+in a text legend sent alongside it.
+"""
+
+import asyncio, hashlib, struct, zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from ALTANTIS.utils.consts import MAP_TILE_SIZE, RENDER_CACHE_SIZE
+
+# The colours of the image, by palette index.
+PALETTE : List[Tuple[int, int, int]] = [
+    (30, 80, 160),   # 0: normal water
+    (70, 130, 200),  # 1: calm
+    (20, 50, 110),   # 2: rough
+    (60, 60, 90),    # 3: stormy
+    (230, 190, 40),  # 4: treasure
+    (150, 110, 80),  # 5: ruins
+    (120, 120, 120), # 6: junk
+    (180, 90, 40),   # 7: deposit
+    (40, 170, 90),   # 8: diverse
+    (45, 35, 25),    # 9: walls
+    (240, 240, 240), # 10: docking
+    (200, 50, 50),   # 11: NPCs
+    (250, 140, 0),   # 12: subs
+    (0, 0, 0),       # 13: sub numbers
+    (255, 0, 255),   # 14: anything else
+]
+
+# The colour of each map character's tile. Walls can be drawn in any of the
+# wall styles.
+CHAR_COLOURS = {".": 0, "C": 1, "R": 2, "S": 3, "T": 4, "A": 5, "J": 6,
+                "M": 7, "E": 8, "W": 9, "b": 9, "h": 9, "z": 9, "v": 9,
+                "p": 9, "l": 9, "D": 10, "N": 11}
+UNKNOWN_COLOUR = 14
+
+# 3x5 glyphs for the characters subs are marked with.
+SUB_GLYPHS = {
+    "1": ["010", "110", "010", "010", "111"], "2": ["111", "001", "111", "100", "111"],
+    "3": ["111", "001", "111", "001", "111"], "4": ["101", "101", "111", "001", "001"],
+    "5": ["111", "100", "111", "001", "111"], "6": ["111", "100", "111", "101", "111"],
+    "7": ["111", "001", "001", "001", "001"], "8": ["111", "101", "111", "101", "111"],
+    "9": ["111", "101", "111", "001", "111"], "0": ["111", "101", "101", "101", "111"],
+    "-": ["000", "000", "111", "000", "000"], "+": ["000", "010", "111", "010", "000"],
+    "=": ["000", "111", "000", "111", "000"]
+}
+
+def make_tiles(size : int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Makes a tile for every character that can appear in the map. Returns the
+    tiles (indexed by tile number) and which tile each character (by code
+    point, up to 128) uses.
+    """
+    tiles = [np.full((size, size), UNKNOWN_COLOUR, dtype=np.uint8)]
+    lookup = np.zeros(128, dtype=np.intp)
+    for (char, colour) in CHAR_COLOURS.items():
+        lookup[ord(char)] = len(tiles)
+        tiles.append(np.full((size, size), colour, dtype=np.uint8))
+    (top, left) = ((size - 5) // 2, (size - 3) // 2)
+    for (char, glyph) in SUB_GLYPHS.items():
+        tile = np.full((size, size), 12, dtype=np.uint8)
+        if size >= 5:
+            for (row, bits) in enumerate(glyph):
+                for (column, bit) in enumerate(bits):
+                    if bit == "1":
+                        tile[top + row, left + column] = 13
+        lookup[ord(char)] = len(tiles)
+        tiles.append(tile)
+    return np.stack(tiles), lookup
+
+TILES, TILE_LOOKUP = make_tiles(MAP_TILE_SIZE)
+
+def png_chunk(kind : bytes, data : bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def encode_png(pixels : np.ndarray, palette : List[Tuple[int, int, int]]) -> bytes:
+    """
+    Encodes a 2D array of palette indices as an 8-bit paletted PNG.
+    """
+    (height, width) = pixels.shape
+    # Every row starts with its filter type, which for us is always none.
+    rows = np.zeros((height, width + 1), dtype=np.uint8)
+    rows[:, 1:] = pixels
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+        png_chunk(b"PLTE", bytes(channel for colour in palette for channel in colour)),
+        png_chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)),
+        png_chunk(b"IEND", b"")
+    ])
+
+def map_to_png(map_string : str) -> bytes:
+    """
+    Draws a map made by draw_map as a PNG, with one tile per square.
+    """
+    rows = map_string.rstrip("\n").split("\n")
+    width = max(len(row) for row in rows)
+    codes = np.zeros((len(rows), width), dtype=np.uint32)
+    for (y, row) in enumerate(rows):
+        codes[y, :len(row)] = np.frombuffer(row.encode("utf-32-le"), dtype=np.uint32)
+    tile_numbers = np.where(codes < 128, TILE_LOOKUP[np.minimum(codes, 127)], 0)
+    size = TILES.shape[1]
+    # (row, column, tile row, tile column) -> (row, tile row, column, tile column)
+    pixels = TILES[tile_numbers].transpose(0, 2, 1, 3).reshape(len(rows) * size, width * size)
+    return encode_png(pixels, PALETTE)
+
+def map_legend(map_json : List[Dict[str, Any]]) -> str:
+    """
+    Lists the names of the squares in the JSON from draw_map, one square per
+    line (in the order draw_map gives them).
+    """
+    lines : List[str] = []
+    last = None
+    for entry in map_json:
+        if entry["name"] == "":
+            continue
+        pos = (entry["x"], entry["y"])
+        if pos == last:
+            lines[-1] += f"; {entry['name']}"
+        else:
+            lines.append(f"({pos[0]}, {pos[1]}): {entry['name']}")
+            last = pos
+    return "".join(line + "\n" for line in lines)
+
+# Images are drawn one at a time, off the event loop.
+image_executor = ThreadPoolExecutor(max_workers=1)
+# Finished images by the digest of their map, oldest first.
+images : Dict[str, bytes] = {}
+# Images being drawn, by the digest of their map.
+drawing : Dict[str, asyncio.Future] = {}
+
+async def render_map_image(map_string : str) -> bytes:
+    """
+    Gets the PNG of a map made by draw_map, drawing it if we haven't already.
+    """
+    digest = hashlib.sha1(map_string.encode("utf-8")).hexdigest()
+    if digest in images:
+        return images[digest]
+    if digest not in drawing:
+        loop = asyncio.get_event_loop()
+        future = asyncio.ensure_future(loop.run_in_executor(image_executor, map_to_png, map_string))
+        drawing[digest] = future
+
+        def finished(done : asyncio.Future):
+            drawing.pop(digest, None)
+            if not done.cancelled() and done.exception() is None:
+                if len(images) >= RENDER_CACHE_SIZE:
+                    del images[next(iter(images))]
+                images[digest] = done.result()
+        future.add_done_callback(finished)
+    return await asyncio.shield(drawing[digest])
@@ -0,0 +1,168 @@
+"""
+Finds the quickest route for a sub between two squares, for the autopilot
+(see !course in cogs/movement.py).
+Routes are found with A*, where each step costs the difficulty of the square
+it leaves (as that is what the engines have to put in before the sub moves).
+Walls are avoided, and docking stations can only be the end of a route, as
+entering one docks the sub.
+The difficulty of every square is kept here, and only looked up again for
+squares whose version has changed. Subs keep the route they are following
+(with the terrain along it), and only search again once the terrain along the
+rest of it changes. That is checked against the terrain rather than versions
+so that a game recovered from the journal follows the same routes. Searches
+stop after looking at a fixed number of squares, so no one query can hold up
+the game for long, and then give the route to the closest square they found,
+from the end of which the autopilot searches again.
+"""
+
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ALTANTIS.utils.consts import PATH_SEARCH_LIMIT
+from ALTANTIS.utils.direction import directions, diagonal_distance
+from ALTANTIS.utils.geometry import ring
+from ALTANTIS.world.layers import layers
+from ALTANTIS.world.world import get_square
+
+# The eight steps a sub can take.
+STEPS = list(ring(1))
+# The direction of each step.
+STEP_DIRECTIONS = {offset: direction for (direction, offset) in directions.items()}
+
+# What is in each square, as far as routes are concerned.
+OPEN = 1
+DOCK = 0
+WALL = -1
+
+class Pathfinder():
+    def __init__(self):
+        self.generation : Optional[int] = None
+        self.versions = np.zeros((0, 0), dtype=np.uint32)
+        # The difficulty of, and what is in, each square, indexed [x][y].
+        self.costs : List[List[int]] = []
+        self.kinds : List[List[int]] = []
+        self.min_cost = 1
+
+    def refresh(self):
+        """
+        Looks up the squares that have changed since we last did.
+        """
+        if self.generation != layers.generation or self.versions.shape != layers.version.shape:
+            # A new map, so everything not stored is normal water, and every
+            # stored square has a version.
+            (x_limit, y_limit) = layers.version.shape
+            self.generation = layers.generation
+            self.versions = np.zeros((x_limit, y_limit), dtype=np.uint32)
+            self.costs = [[4] * y_limit for _ in range(x_limit)]
+            self.kinds = [[OPEN] * y_limit for _ in range(x_limit)]
+        changed = np.argwhere(layers.version != self.versions)
+        if len(changed) == 0:
+            return
+        for (x, y) in changed.tolist():
+            square = get_square(x, y)
+            self.costs[x][y] = square.difficulty()
+            if "obstacle" in square.attributes:
+                self.kinds[x][y] = WALL
+            elif "docking" in square.attributes:
+                self.kinds[x][y] = DOCK
+            else:
+                self.kinds[x][y] = OPEN
+        self.versions = layers.version.copy()
+        self.min_cost = min(min(column) for column in self.costs) if len(self.costs) > 0 else 1
+
+    def search(self, start : Tuple[int, int], goal : Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        """
+        A* from start to goal, or None if there is no route. If the goal is
+        too far to find, the route goes as close to it as we got instead.
+        """
+        (x_limit, y_limit) = self.versions.shape
+        for (x, y) in (start, goal):
+            if not (0 <= x < x_limit and 0 <= y < y_limit):
+                return None
+        if self.kinds[goal[0]][goal[1]] == WALL:
+            return None
+        # (estimated total cost, estimated cost left, order found, square)
+        left = self.min_cost * diagonal_distance(start, goal)
+        frontier = [(left, left, 0, start)]
+        costs : Dict[Tuple[int, int], int] = {start: 0}
+        came_from : Dict[Tuple[int, int], Tuple[int, int]] = {}
+        found = 0
+        expanded = 0
+        # The closest square to the goal we've found (breaking ties by how
+        # quickly we can get there).
+        closest = (left, 0, start)
+        while len(frontier) > 0:
+            (estimate, left, _, pos) = heapq.heappop(frontier)
+            if estimate - left > costs[pos]:
+                # We've since found a quicker way here.
+                continue
+            if pos == goal:
+                return self.path_to(pos, came_from)
+            closest = min(closest, (left, costs[pos], pos))
+            expanded += 1
+            if expanded > PATH_SEARCH_LIMIT:
+                if closest[2] == start:
+                    return None
+                return self.path_to(closest[2], came_from)
+            (x, y) = pos
+            cost = costs[pos] + self.costs[x][y]
+            for (dx, dy) in STEPS:
+                (nx, ny) = (x + dx, y + dy)
+                if not (0 <= nx < x_limit and 0 <= ny < y_limit):
+                    continue
+                kind = self.kinds[nx][ny]
+                if kind == WALL or (kind == DOCK and (nx, ny) != goal):
+                    continue
+                if cost < costs.get((nx, ny), cost + 1):
+                    costs[(nx, ny)] = cost
+                    came_from[(nx, ny)] = pos
+                    left = self.min_cost * max(abs(goal[0] - nx), abs(goal[1] - ny))
+                    found += 1
+                    heapq.heappush(frontier, (cost + left, left, found, (nx, ny)))
+        return None
+
+    def path_to(self, pos : Tuple[int, int], came_from : Dict[Tuple[int, int], Tuple[int, int]]) -> List[Tuple[int, int]]:
+        path = [pos]
+        while pos in came_from:
+            pos = came_from[pos]
+            path.append(pos)
+        path.reverse()
+        return path
+
+    def terrain(self, path : List[Tuple[int, int]]) -> List[int]:
+        """
+        What each square along a path is like: its difficulty if it is open
+        water, or DOCK or WALL.
+        """
+        self.refresh()
+        return [self.costs[x][y] if self.kinds[x][y] == OPEN else self.kinds[x][y] for (x, y) in path]
+
+    def find_path(self, start : Tuple[int, int], goal : Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        """
+        The quickest route from start to goal (both included), or None if
+        there isn't one. Routes to goals too far to find stop short of them.
+        """
+        self.refresh()
+        return self.search(start, goal)
+
+    def follow(self, route : List[Tuple[int, int]], terrain : List[int], pos : Tuple[int, int]) -> Optional[int]:
+        """
+        Where pos is along a route found earlier (with the terrain along it
+        then), if it is on it and the terrain along the rest hasn't changed.
+        """
+        if pos not in route:
+            return None
+        i = route.index(pos)
+        if self.terrain(route[i:]) != terrain[i:]:
+            return None
+        return i
+
+def step_direction(start : Tuple[int, int], end : Tuple[int, int]) -> str:
+    """
+    The direction of a step between neighbouring squares.
+    """
+    return STEP_DIRECTIONS[(end[0] - start[0], end[1] - start[1])]
+
+pathfinder = Pathfinder()
@@ -0,0 +1,134 @@
+"""
+Draws the map for !map and !mapall.
+What each square looks like for a set of options is kept in a base layer,
+which is only redrawn where the map's version layer says a square has
+changed. Fog (squares hidden from the perspective of the subs being drawn
+for), NPCs and subs are then put on top of a copy of it. Drawing the same
+map twice in a turn, with nothing changed in between, just returns the last
+one.
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from ALTANTIS.utils.consts import RENDER_CACHE_SIZE
+from ALTANTIS.utils.text import list_to_and_separated
+from ALTANTIS.world.world import get_square, in_world, map_size, current_tick, catch_up_due
+from ALTANTIS.world.layers import layers
+from ALTANTIS.world.spatial import npc_index
+
+SUB_CHARS = ['1','2','3','4','5','6','7','8','9','0','-','+','=']
+
+class BaseLayer():
+    """
+    The character and name of every square for one set of options, both as
+    seen by those who can see it and (for hidden squares) those who can't.
+    """
+    def __init__(self, to_show : Tuple[str, ...]):
+        self.to_show = list(to_show)
+        self.generation = -1
+
+    def refresh(self):
+        """
+        Redraws the squares that have changed since we last looked, or all of
+        them if the map has been replaced.
+        """
+        if self.generation != layers.generation:
+            (x_limit, y_limit) = map_size()
+            self.chars = np.full((x_limit, y_limit), ".", dtype="<U1")
+            self.names : Dict[Tuple[int, int], str] = {}
+            self.fog_chars = np.full((x_limit, y_limit), ".", dtype="<U1")
+            self.version = np.zeros((x_limit, y_limit), dtype=layers.version.dtype)
+            self.generation = layers.generation
+        # Taken first, so anything drawing a square changes is redrawn next time.
+        version = layers.version.copy()
+        for (x, y) in np.argwhere(self.version != version):
+            self.draw_square(int(x), int(y))
+        self.version = version
+
+    def draw_square(self, x : int, y : int):
+        square = get_square(x, y)
+        if square is None:
+            return
+        self.chars[x, y] = square.to_char(self.to_show, True)
+        name = square.map_name(self.to_show, True)
+        if name is not None:
+            self.names[(x, y)] = name
+        else:
+            self.names.pop((x, y), None)
+        # Without show_hidden or a perspective, this is the square as seen by
+        # those who haven't explored it.
+        self.fog_chars[x, y] = square.to_char(self.to_show, False)
+
+# Base layers by (sorted) options, oldest first.
+base_layers : Dict[Tuple[str, ...], BaseLayer] = {}
+# The last map drawn for each set of options, hidden-mode and subs, with what
+# the game was like when it was drawn.
+drawn_maps : Dict[Tuple[Any, ...], Tuple[Tuple[int, ...], Tuple[str, List[Dict[str, Any]]]]] = {}
+
+def get_base_layer(to_show : Tuple[str, ...]) -> BaseLayer:
+    if to_show not in base_layers:
+        if len(base_layers) >= RENDER_CACHE_SIZE:
+            del base_layers[next(iter(base_layers))]
+        base_layers[to_show] = BaseLayer(to_show)
+    base = base_layers[to_show]
+    base.refresh()
+    return base
+
+def draw_map(subs : Sequence[Any], to_show : List[str], show_hidden : bool) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Draws an ASCII version of the map.
+    Also returns a JSON of additional information.
+    `subs` is a list of submarines, which are marked 0-9 on the map.
+    """
+    options = tuple(sorted(set(to_show)))
+    key = (options, show_hidden, tuple((sub._name, sub.movement.get_position()) for sub in subs))
+    stamp = (layers.generation, layers.changes, current_tick(), npc_index.version if "n" in options else 0)
+    if key in drawn_maps and drawn_maps[key][0] == stamp:
+        (map_string, map_json) = drawn_maps[key][1]
+        return map_string, list(map_json)
+
+    catch_up_due()
+    base = get_base_layer(options)
+    chars = base.chars.copy()
+    names = dict(base.names)
+
+    # Fog: hidden squares that none of the subs have explored.
+    if not show_hidden:
+        fogged = (layers.hiddenness > 0) & ~layers.explored_by([sub._name for sub in subs], current_tick())
+        chars[fogged] = base.fog_chars[fogged]
+        for (x, y) in np.argwhere(fogged):
+            names[(int(x), int(y))] = ""
+
+    # What we tell the map about each square, in order.
+    entries : Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+    for (x, y) in names:
+        entries[(x, y)] = [{"x": x, "y": y, "name": names[(x, y)]}]
+    if "n" in options:
+        for (x, y) in npc_index.occupied():
+            if not in_world(x, y):
+                continue
+            chars[x, y] = "N"
+            npcs_str = list_to_and_separated(list(map(lambda n: n.name(), npc_index.at((x, y)))))
+            entries.setdefault((x, y), []).append({"x": x, "y": y, "name": npcs_str})
+    for i in range(len(subs)):
+        (x, y) = subs[i].movement.get_position()
+        if not in_world(x, y):
+            continue
+        chars[x, y] = SUB_CHARS[i]
+        entries.setdefault((x, y), []).append({"x": x, "y": y, "name": subs[i].name()})
+
+    # Each row of single characters, viewed as one string.
+    rows = np.ascontiguousarray(chars.T).view(f"<U{chars.shape[0]}")[:, 0]
+    map_string = "".join(row + "\n" for row in rows.tolist())
+    map_json = []
+    for pos in sorted(entries, key=lambda p: (p[1], p[0])):
+        map_json.extend(entries[pos])
+
+    # Catching up may have changed the map, so take the stamp again.
+    stamp = (layers.generation, layers.changes, current_tick(), npc_index.version if "n" in options else 0)
+    if key not in drawn_maps and len(drawn_maps) >= RENDER_CACHE_SIZE:
+        del drawn_maps[next(iter(drawn_maps))]
+    drawn_maps[key] = (stamp, (map_string, map_json))
+    return map_string, list(map_json)
@@ -0,0 +1,109 @@
+"""
+Keeps track of which subs and NPCs are in which square, so that finding what
+is near a point only has to look around that point rather than at every sub
+and NPC in the game.
+The indexes are kept up to date by whatever moves, adds or removes subs and
+NPCs (see MovementControls, NPC.move, add_npc, kill_npc, add_team and
+remove_team), and rebuilt whenever the state or NPCs are loaded.
+"""
+
+from typing import Any, Dict, Iterable, List, Tuple
+
+from ALTANTIS.utils.direction import diagonal_distance
+from ALTANTIS.utils.geometry import ring_offsets
+
+class SpatialIndex():
+    """
+    Entities by the square they are in, each stored under a key (a sub's name
+    or an NPC's ID). Queries return entities ordered by key, so results don't
+    depend on the order things moved in.
+    """
+    def __init__(self):
+        self.squares : Dict[Tuple[int, int], Dict[Any, Any]] = {}
+        self.positions : Dict[Any, Tuple[int, int]] = {}
+        # Counts changes, so anything worked out from where entities are can
+        # tell whether it is out of date.
+        self.version = 0
+
+    def clear(self):
+        self.squares = {}
+        self.positions = {}
+        self.version += 1
+
+    def add(self, key : Any, entity : Any, pos : Tuple[int, int]):
+        if key in self.positions:
+            self.remove(key)
+        self.positions[key] = pos
+        self.squares.setdefault(pos, {})[key] = entity
+        self.version += 1
+
+    def add_many(self, entries : Iterable[Tuple[Any, Any, Tuple[int, int]]]):
+        """
+        Adds (key, entity, pos) for entities not yet in the index, all at once.
+        """
+        for (key, entity, pos) in entries:
+            self.positions[key] = pos
+            self.squares.setdefault(pos, {})[key] = entity
+        self.version += 1
+
+    def remove(self, key : Any):
+        pos = self.positions.pop(key, None)
+        if pos is None:
+            return
+        square = self.squares[pos]
+        del square[key]
+        if len(square) == 0:
+            del self.squares[pos]
+        self.version += 1
+
+    def move(self, key : Any, pos : Tuple[int, int]):
+        """
+        Moves the entity with that key to pos. Entities that aren't in the
+        index (say, a sub that is still being loaded) are ignored.
+        """
+        old_pos = self.positions.get(key)
+        if old_pos is None or old_pos == pos:
+            return
+        entity = self.squares[old_pos][key]
+        self.remove(key)
+        self.add(key, entity, pos)
+
+    def occupied(self) -> List[Tuple[int, int]]:
+        """
+        Every square with something in it.
+        """
+        return list(self.squares)
+
+    def at(self, pos : Tuple[int, int]) -> List[Any]:
+        """
+        Everything in the square pos.
+        """
+        square = self.squares.get(pos)
+        if square is None:
+            return []
+        return [square[key] for key in sorted(square)]
+
+    def within(self, pos : Tuple[int, int], dist : int) -> List[Any]:
+        """
+        Everything at most dist (by diagonal_distance) from pos. This looks at
+        whichever is fewer: the squares in range, or the occupied squares.
+        """
+        if dist < 0:
+            return []
+        (cx, cy) = pos
+        found : Dict[Any, Any] = {}
+        if (2 * dist + 1) ** 2 <= len(self.squares):
+            for offsets in ring_offsets(dist):
+                for (dx, dy) in offsets:
+                    square = self.squares.get((cx + dx, cy + dy))
+                    if square is not None:
+                        found.update(square)
+        else:
+            for (square_pos, square) in self.squares.items():
+                if diagonal_distance(square_pos, pos) <= dist:
+                    found.update(square)
+        return [found[key] for key in sorted(found)]
+
+# Subs by name, and NPCs by ID.
+sub_index = SpatialIndex()
+npc_index = SpatialIndex()
@@ -0,0 +1,113 @@
+"""
+The treasure in a square, which can build up a lot over a game (spawning
+squares and NPCs like quarries keep adding to the same few squares).
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from ALTANTIS.utils.text import list_to_and_separated
+
+class TreasurePile():
+    """
+    A multiset of treasure: how many of each kind there are, kept in a
+    Fenwick tree so that picking a random item (each equally likely) is
+    O(log kinds) rather than going through every item. Iterates (and
+    serialises) as a list of items, grouped by kind in the order kinds were
+    first added.
+    """
+    def __init__(self, items : Iterable[str] = ()):
+        self.kinds : List[str] = []
+        self.positions : Dict[str, int] = {}
+        self.counts : List[int] = []
+        # 1-based, so tree[0] is unused.
+        self.tree : List[int] = [0]
+        self.total = 0
+        # What treasure_string shows, until the pile next changes.
+        self.description : Optional[str] = None
+        for item in items:
+            self.append(item)
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __iter__(self) -> Iterator[str]:
+        for (kind, count) in zip(self.kinds, self.counts):
+            for _ in range(count):
+                yield kind
+
+    def __contains__(self, item : str) -> bool:
+        position = self.positions.get(item)
+        return position is not None and self.counts[position] > 0
+
+    def to_list(self) -> List[str]:
+        return list(self)
+
+    def _rebuild(self):
+        # Builds the tree from the counts in O(kinds).
+        self.tree = [0] + self.counts
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+
+    def _add(self, position : int, delta : int):
+        self.counts[position] += delta
+        self.total += delta
+        self.description = None
+        i = position + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def _find(self, index : int) -> int:
+        # The position of the kind the index'th item (counting through the
+        # kinds in order) is.
+        position = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step > 0:
+            if position + step < len(self.tree) and self.tree[position + step] <= index:
+                position += step
+                index -= self.tree[position]
+            step >>= 1
+        return position
+
+    def append(self, item : str):
+        if item not in self.positions:
+            self.positions[item] = len(self.kinds)
+            self.kinds.append(item)
+            self.counts.append(0)
+            self._rebuild()
+        self._add(self.positions[item], 1)
+
+    def remove(self, item : str) -> bool:
+        """
+        Removes one of item, returning whether there was one to remove.
+        """
+        if item not in self:
+            return False
+        position = self.positions[item]
+        self._add(position, -1)
+        if self.counts[position] == 0 and 2 * self.counts.count(0) > len(self.kinds):
+            self._compact()
+        return True
+
+    def _compact(self):
+        # Forgets kinds we no longer have any of.
+        kept = [(kind, count) for (kind, count) in zip(self.kinds, self.counts) if count > 0]
+        self.kinds = [kind for (kind, _) in kept]
+        self.counts = [count for (_, count) in kept]
+        self.positions = {kind: position for (position, kind) in enumerate(self.kinds)}
+        self._rebuild()
+
+    def pick(self, rng) -> str:
+        """
+        Removes and returns a random item (the pile must not be empty).
+        """
+        kind = self.kinds[self._find(rng.randrange(self.total))]
+        self.remove(kind)
+        return kind
+
+    def display(self) -> str:
+        if self.description is None:
+            self.description = list_to_and_separated(list(map(lambda t: t.title(), self)))
+        return self.description
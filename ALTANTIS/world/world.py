@@ -1,17 +1,43 @@
 """
 Deals with the world map, which submarines explore.
 """
-import string
+import string, math
 from functools import reduce
 
 from ALTANTIS.utils.text import list_to_and_separated
 from ALTANTIS.utils.direction import reverse_dir, directions
 from ALTANTIS.utils.consts import X_LIMIT, Y_LIMIT
 from ALTANTIS.world.validators import InValidator, NopValidator, TypeValidator, BothValidator, LenValidator, RangeValidator
-from ALTANTIS.world.consts import ATTRIBUTES, WEATHER, WALL_STYLES
+from ALTANTIS.world.consts import ATTRIBUTES, WEATHER, WEATHER_CODES, WEATHER_KEEP, WALL_STYLES, SPAWNS, SPAWN_CHANCE, EXPLORED_RESET_CHANCE
+from ALTANTIS.world.layers import layers
+from ALTANTIS.world.treasure import TreasurePile
 
 import random
-from typing import List, Optional, Tuple, Any, Dict, Collection
+import numpy as np
+from types import MappingProxyType
+from typing import List, Optional, Tuple, Any, Dict, Collection, Union, Set
+
+# The number of turns the map has been running for.
+world_tick = 0
+# Mixed into every random event on the map, so that each game differs.
+world_seed = 0
+
+def event_rng(x: int, y: int, kind: str, tick: int) -> random.Random:
+    """
+    The random numbers for an event of some kind at (x, y) on a given tick.
+    These only depend on their arguments (and the world seed) rather than the
+    global RNG, so it doesn't matter when an event is caught up on - which
+    keeps replaying the journal exact.
+    """
+    return random.Random(f"{world_seed}:{x}:{y}:{kind}:{tick}")
+
+def next_event_tick(rng: random.Random, tick: int, chance: float) -> int:
+    """
+    When something with this chance of happening each turn next happens after
+    tick. The gap is geometrically distributed, so this is exactly the same as
+    rolling every turn.
+    """
+    return tick + int(math.log(1.0 - rng.random()) / math.log(1.0 - chance)) + 1
 
 
 class Cell():
@@ -23,65 +49,133 @@ class Cell():
         "hiddenness": BothValidator(TypeValidator(int), RangeValidator(0, 10))
     }
 
-    def __init__(self):
+    def __init__(self, x: int = 0, y: int = 0):
+        self.x = x
+        self.y = y
         # The items this square contains.
-        self.treasure = []
+        self.treasure = TreasurePile()
         # Fundamentally describes how the square acts. These are described
         # throughout the class. A cell with no attributes acts like Empty from
         # the previous version - has no extra difficulty etc.
         self.attributes = {}
-        # The list of subs for whom the hiddenness attribute no longer affects the rendering of the map
-        self.explored = set([])
+        # Rather than rolling for treasure spawns every turn, we keep the turn
+        # each next happens, and catch up on them whenever the square is
+        # looked at (see catch_up).
+        self.next_event : Dict[str, int] = {}
 
     @classmethod
-    def _from_dict(cls, serialisation):
-        p = cls()
-        p.treasure = list(serialisation['treasure'])
+    def _from_dict(cls, serialisation, x: int = 0, y: int = 0):
+        p = cls(x, y)
+        p.treasure = TreasurePile(serialisation['treasure'])
         p.attributes = dict(serialisation['attributes'])
-        if "explored" in serialisation:
-            p.explored = set(serialisation["explored"])
+        if "next_event" in serialisation:
+            p.next_event = dict(serialisation["next_event"])
+        else:
+            for kind in SPAWNS:
+                if kind in p.attributes:
+                    p._start_events(kind, SPAWN_CHANCE)
+        explored = serialisation.get("explored", [])
+        # Older saves kept when exploration runs out as an event.
+        until = p.next_event.pop("explored", None)
+        if len(explored) > 0:
+            if "explored_until" in serialisation:
+                until = serialisation["explored_until"]
+            elif until is None:
+                until = p._exploration_ends()
+            layers.start_exploring(x, y, until)
+            for name in explored:
+                layers.explore(x, y, name)
         return p
 
+    def is_default(self) -> bool:
+        # Whether this cell is just normal water, and so needn't be stored.
+        return len(self.treasure) == 0 and len(self.attributes) == 0 and len(self.explored) == 0
+
     def _to_dict(self):
         return {
-            "treasure": list(self.treasure),
+            "treasure": self.treasure.to_list(),
             "attributes": dict(self.attributes),
-            "explored": list(self.explored)
+            "explored": sorted(self.explored),
+            "explored_until": int(layers.explored_until[self.x, self.y]) if len(self.explored) > 0 else 0,
+            "next_event": dict(self.next_event)
         }
 
-    def cell_tick(self):
-        if "deposit" in self.attributes and random.random() < 0.015:
-            self.treasure.append("plating")
-        if "diverse" in self.attributes and random.random() < 0.015:
-            self.treasure.append("specimen")
-        if "ruins" in self.attributes and random.random() < 0.015:
-            self.treasure.append(random.choice(["tool", "circuitry"]))
-        if random.random() < 0.01:
-            self.explored.clear()
+    @property
+    def explored(self) -> Set[str]:
+        # The subs for whom the hiddenness attribute no longer affects the
+        # rendering of the map. Only hidden squares are explored, and who
+        # explored them is kept in layers.
+        if "hiddenness" not in self.attributes:
+            return set()
+        return set(layers.explorers(self.x, self.y, world_tick))
+
+    def _exploration_ends(self) -> int:
+        # When exploration that starts this turn runs out.
+        return next_event_tick(event_rng(self.x, self.y, "explored", world_tick), world_tick, EXPLORED_RESET_CHANCE)
+
+    def _changed(self):
+        # Must be called whenever the treasure, attributes, explorers or
+        # next_event change.
+        layers.update(self)
+        pos = (self.x, self.y)
+        for attr in ATTRIBUTES:
+            if attr in self.attributes:
+                attribute_index[attr].add(pos)
+            else:
+                attribute_index[attr].discard(pos)
+        if len(self.treasure) > 0:
+            treasure_index.add(pos)
+        else:
+            treasure_index.discard(pos)
+
+    def _start_events(self, kind: str, chance: float):
+        self.next_event[kind] = next_event_tick(event_rng(self.x, self.y, kind, world_tick), world_tick, chance)
+        self._changed()
+
+    def catch_up(self):
+        """
+        Performs every spawn due by now, in the order they would have
+        happened had we rolled for them each turn. (Exploration running out
+        needs no catching up on - see Layers.explorers.)
+        """
+        happened = False
+        while len(self.next_event) > 0:
+            kind = min(self.next_event, key=lambda k: self.next_event[k])
+            tick = self.next_event[kind]
+            if tick > world_tick:
+                break
+            rng = event_rng(self.x, self.y, kind, tick)
+            happened = True
+            self.treasure.append(rng.choice(SPAWNS[kind]))
+            self.next_event[kind] = next_event_tick(rng, tick, SPAWN_CHANCE)
+        if happened:
+            self._changed()
 
     def treasure_string(self) -> str:
-        return list_to_and_separated(list(map(lambda t: t.title(), self.treasure)))
+        return self.treasure.display()
 
     def square_status(self) -> str:
+        self.catch_up()
         return f"This square has treasures {self.treasure_string()} and attributes {self.attributes}."
 
     def pick_up(self, power: int) -> List[str]:
+        self.catch_up()
         power = min(power, len(self.treasure))
-        treasures = []
-        for _ in range(power):
-            treas = random.choice(self.treasure)
-            self.treasure.remove(treas)
-            treasures.append(treas)
+        treasures = [self.treasure.pick(random) for _ in range(power)]
+        if len(treasures) > 0:
+            self._changed()
         return treasures
 
     def bury_treasure(self, treasure: str) -> bool:
+        self.catch_up()
         self.treasure.append(treasure)
+        self._changed()
         return True
 
     def unbury_treasure(self, treasure: str) -> bool:
-        if treasure in self.treasure:
-            index = self.treasure.index(treasure)
-            del self.treasure[index]
+        self.catch_up()
+        if self.treasure.remove(treasure):
+            self._changed()
             return True
         return False
 
@@ -99,6 +193,7 @@ class Cell():
         return None
 
     def outward_broadcast(self, strength: int) -> str:
+        self.catch_up()
         # This is what the sub sees when scanning this cell.
         suffix = ""
         if "hiddenness" in self.attributes:
@@ -154,6 +249,7 @@ class Cell():
 
     def to_char(self, to_show: List[str], show_hidden: bool = False,
                 perspective: Optional[Collection[str]] = None) -> str:
+        self.catch_up()
         if show_hidden or not self._hidden(0, perspective):
             if "t" in to_show and len(self.treasure) > 0:
                 return "T"
@@ -178,6 +274,7 @@ class Cell():
 
     def map_name(self, to_show: List[str], show_hidden: bool = False,
                  perspective: Optional[Collection[str]] = None) -> Optional[str]:
+        self.catch_up()
         # For Thomas' map drawing code.
         # Gives names to squares that make sense.
         treasure = ""
@@ -206,14 +303,22 @@ class Cell():
         return difficulties.get(self.attributes.get('weather', "normal"), 4) + modifier
 
     def has_been_scanned(self, subname: str, strength: int) -> None:
-        if not self._hidden(strength):
-            self.explored.add(subname)
+        # Exploring only matters for hidden squares (and adding hiddenness
+        # clears it anyway), so only bother recording it for them.
+        if "hiddenness" in self.attributes and not self._hidden(strength):
+            explorers = layers.explorers(self.x, self.y, world_tick)
+            if subname in explorers:
+                return
+            if len(explorers) == 0:
+                layers.start_exploring(self.x, self.y, self._exploration_ends())
+            layers.explore(self.x, self.y, subname)
+            self._changed()
 
     def _hidden(self, strength: int, ships: Optional[Collection[str]] = None) -> bool:
-        if ships and not self.explored.isdisjoint(ships):
+        self.catch_up()
+        if "hiddenness" not in self.attributes or self.attributes["hiddenness"] <= strength:
             return False
-        else:
-            return "hiddenness" in self.attributes and self.attributes["hiddenness"] > strength
+        return not (ships and layers.is_explored(self.x, self.y, ships, world_tick))
 
     def add_attribute(self, attr: str, val="") -> bool:
         if attr not in ATTRIBUTES:
@@ -225,19 +330,129 @@ class Cell():
             return False
 
         if attr not in self.attributes or self.attributes[attr] != clean:
+            self.catch_up()
+            if attr in SPAWNS and attr not in self.attributes:
+                self._start_events(attr, SPAWN_CHANCE)
             self.attributes[attr] = clean
-            self.explored.clear()
+            layers.clear_explored(self.x, self.y)
+            self._changed()
             return True
         return False
 
     def remove_attribute(self, attr: str) -> bool:
         if attr in self.attributes:
+            self.catch_up()
             del self.attributes[attr]
-            self.explored.clear()
+            layers.clear_explored(self.x, self.y)
+            self.next_event.pop(attr, None)
+            self._changed()
             return True
         return False
 
-undersea_map = [[Cell() for _ in range(Y_LIMIT)] for _ in range(X_LIMIT)]
+    def set_weather(self, weather: str) -> bool:
+        # Unlike add_attribute, this doesn't reset exploration (for mass_weather).
+        # Normal weather is the same as no weather, so isn't stored.
+        if self.attributes.get("weather", "normal") == weather:
+            return False
+        if weather == "normal":
+            del self.attributes["weather"]
+        else:
+            self.attributes["weather"] = weather
+        self._changed()
+        return True
+
+# The map is sparse: only squares that differ from normal water (which we call
+# materialised) are stored, by position. Every other square is a DefaultCell,
+# which reads from _DEFAULT and materialises a Cell as soon as it is changed.
+cells : Dict[Tuple[int, int], Cell] = {}
+layers.reset(X_LIMIT, Y_LIMIT)
+
+# The squares with each attribute, and the squares with treasure (as of when
+# they last caught up), kept up to date by Cell._changed. These let us find
+# things on the map without looking at every square.
+attribute_index : Dict[str, Set[Tuple[int, int]]] = {attr: set() for attr in ATTRIBUTES}
+treasure_index : Set[Tuple[int, int]] = set()
+
+def reset_indexes():
+    for attr in ATTRIBUTES:
+        attribute_index[attr] = set()
+    treasure_index.clear()
+
+_DEFAULT = Cell()
+_DEFAULT.treasure = TreasurePile()
+_DEFAULT.attributes = MappingProxyType({})  # type: ignore
+_DEFAULT.next_event = MappingProxyType({})  # type: ignore
+
+class DefaultCell():
+    """
+    Stands in for a square that hasn't been materialised (yet). Behaves exactly
+    like a Cell - any method that could change the square materialises it first.
+    """
+    # The only methods that can change a square that is just normal water.
+    MUTATORS = {"bury_treasure", "add_attribute", "set_weather"}
+
+    def __init__(self, x: int, y: int):
+        self.x = x
+        self.y = y
+
+    def __getattr__(self, name: str) -> Any:
+        cell = cells.get((self.x, self.y))
+        if cell is None:
+            if name in DefaultCell.MUTATORS:
+                cell = materialise(self.x, self.y)
+            else:
+                cell = _DEFAULT
+        return getattr(cell, name)
+
+def materialise(x: int, y: int) -> Cell:
+    """
+    Gets the stored square at (x, y), storing a new one if needed.
+    """
+    cell = cells.get((x, y))
+    if cell is None:
+        cell = Cell(x, y)
+        cells[(x, y)] = cell
+    return cell
+
+def new_map(x_limit: int = X_LIMIT, y_limit: int = Y_LIMIT):
+    """
+    Replaces the map with an empty one of the given size.
+    """
+    global X_LIMIT, Y_LIMIT, cells, world_tick, world_seed
+    X_LIMIT = x_limit
+    Y_LIMIT = y_limit
+    cells = {}
+    layers.reset(X_LIMIT, Y_LIMIT)
+    reset_indexes()
+    world_tick = 0
+    world_seed = random.getrandbits(32)
+
+def map_size() -> Tuple[int, int]:
+    return (X_LIMIT, Y_LIMIT)
+
+def current_tick() -> int:
+    return world_tick
+
+def catch_up_due():
+    """
+    Catches up every square with something due, for when we need the whole
+    map to be up to date (say, to draw it).
+    """
+    for pos in layers.due_squares(world_tick):
+        cells[pos].catch_up()
+
+def squares_with(attr: str) -> List[Tuple[int, int]]:
+    """
+    The squares with an attribute, in order.
+    """
+    return sorted(attribute_index.get(attr, ()))
+
+def squares_with_treasure() -> List[Tuple[int, int]]:
+    """
+    The squares with any treasure, in order.
+    """
+    catch_up_due()
+    return sorted(treasure_index)
 
 def in_world(x: int, y: int) -> bool:
     return 0 <= x < X_LIMIT and 0 <= y < Y_LIMIT
@@ -245,53 +460,126 @@ def in_world(x: int, y: int) -> bool:
 def possible_directions() -> List[str]:
     return list(directions.keys())
 
-def get_square(x: int, y: int) -> Optional[Cell]:
+def get_square(x: int, y: int) -> Optional[Union[Cell, DefaultCell]]:
     if in_world(x, y):
-        return undersea_map[x][y]
+        cell = cells.get((x, y))
+        if cell is None:
+            return DefaultCell(x, y)
+        return cell
     return None
 
 def bury_treasure_at(name: str, pos: Tuple[int, int]) -> bool:
     (x, y) = pos
     if in_world(x, y):
-        return undersea_map[x][y].bury_treasure(name)
+        return materialise(x, y).bury_treasure(name)
     return False
 
 def unbury_treasure_at(name: str, pos: Tuple[int, int]) -> bool:
     (x, y) = pos
-    if in_world(x, y):
-        return undersea_map[x][y].unbury_treasure(name)
+    if (x, y) in cells:
+        return cells[(x, y)].unbury_treasure(name)
     return False
 
 def pick_up_treasure(pos: Tuple[int, int], power: int) -> List[str]:
-    (x, y) = pos
-    if in_world(x, y):
-        return undersea_map[x][y].pick_up(power)
+    if pos in cells:
+        return cells[pos].pick_up(power)
     return []
 
+# The weather with each code in the weather layer.
+WEATHER_NAMES = {code: weather for (weather, code) in WEATHER_CODES.items()}
+
+def paint_weather(x0: int, y0: int, codes: np.ndarray) -> int:
+    """
+    Sets the weather of the squares covered by codes (indexed [x, y], with
+    codes[0, 0] at (x0, y0)) to the weather with each code, leaving squares
+    marked WEATHER_KEEP (or off the map) alone. This is checked against the
+    weather layer first, so squares that already have that weather aren't
+    touched at all, and nothing built from them needs redoing. Like
+    set_weather, it doesn't reset exploration. Returns how many squares
+    changed.
+    """
+    (x_limit, y_limit) = layers.weather.shape
+    (x_start, y_start) = (max(x0, 0), max(y0, 0))
+    (x_end, y_end) = (min(x0 + codes.shape[0], x_limit), min(y0 + codes.shape[1], y_limit))
+    if x_end <= x_start or y_end <= y_start:
+        return 0
+    window = codes[x_start - x0:x_end - x0, y_start - y0:y_end - y0]
+    changed = np.argwhere((window != WEATHER_KEEP) & (window != layers.weather[x_start:x_end, y_start:y_end]))
+    for (dx, dy) in changed:
+        (x, y) = (x_start + int(dx), y_start + int(dy))
+        materialise(x, y).set_weather(WEATHER_NAMES[int(window[dx, dy])])
+    return len(changed)
+
+def weather_rect(weather: str, x0: int, y0: int, x1: int, y1: int) -> int:
+    """
+    Sets the weather of every square from (x0, y0) to (x1, y1) inclusive.
+    """
+    if weather not in WEATHER_CODES or x1 < x0 or y1 < y0:
+        return 0
+    codes = np.full((x1 - x0 + 1, y1 - y0 + 1), WEATHER_CODES[weather], dtype=np.uint8)
+    return paint_weather(x0, y0, codes)
+
+def weather_within(weather: str, pos: Tuple[int, int], radius: int) -> int:
+    """
+    Sets the weather of every square at most radius from pos. As distances
+    are diagonal, this "circle" is a square.
+    """
+    (x, y) = pos
+    return weather_rect(weather, x - radius, y - radius, x + radius, y + radius)
+
+def weather_ring(weather: str, pos: Tuple[int, int], dist: int) -> int:
+    """
+    Sets the weather of every square exactly dist from pos.
+    """
+    if weather not in WEATHER_CODES or dist < 0:
+        return 0
+    codes = np.full((2 * dist + 1, 2 * dist + 1), WEATHER_CODES[weather], dtype=np.uint8)
+    codes[1:-1, 1:-1] = WEATHER_KEEP
+    (x, y) = pos
+    return paint_weather(x - dist, y - dist, codes)
+
 def map_tick():
-    for x in range(X_LIMIT):
-        for y in range(Y_LIMIT):
-            undersea_map[x][y].cell_tick()
+    # Squares catch up on what happened to them when they're next looked at,
+    # so a turn on the map costs nothing.
+    global world_tick
+    world_tick += 1
 
 def map_to_dict() -> Dict[str, Any]:
     """
-    Converts our map to dict form. Since each of our map entries can be
-    trivially converted into dicts, we just convert them individually.
-    We also append a class identifier so they can be recreated correctly.
+    Converts our map to dict form. Only squares that aren't normal water are
+    kept, as [x, y, square] triples.
     """
-    undersea_map_dicts : List[List[Dict[str, Any]]] = [[{} for _ in range(Y_LIMIT)] for _ in range(X_LIMIT)]
-    for i in range(X_LIMIT):
-        for j in range(Y_LIMIT):
-            undersea_map_dicts[i][j] = undersea_map[i][j]._to_dict()
-    return {"map": undersea_map_dicts, "x_limit": X_LIMIT, "y_limit": Y_LIMIT}
+    stored = []
+    for (x, y) in sorted(cells):
+        cell = cells[(x, y)]
+        if not cell.is_default():
+            stored.append([x, y, cell._to_dict()])
+    return {"cells": stored, "x_limit": X_LIMIT, "y_limit": Y_LIMIT, "tick": world_tick, "seed": world_seed}
 
 def map_from_dict(dictionary: Dict[str, Any]):
     """
-    Takes a triple generated by map_to_dict and overwrites our map with it.
+    Takes a dict generated by map_to_dict and overwrites our map with it.
+    Also takes the dense form older saves used, where "map" held every square.
     """
-    global X_LIMIT, Y_LIMIT, undersea_map
+    global X_LIMIT, Y_LIMIT, cells, world_tick, world_seed
     X_LIMIT = dictionary["x_limit"]
     Y_LIMIT = dictionary["y_limit"]
-    map_dicts = dictionary["map"]
-    undersea_map_new = [[Cell._from_dict(map_dicts[x][y]) for y in range(Y_LIMIT)] for x in range(X_LIMIT)]
-    undersea_map = undersea_map_new
+    world_tick = dictionary.get("tick", 0)
+    world_seed = dictionary.get("seed", 0)
+    # Reset first, as loading a square records who explored it.
+    layers.reset(X_LIMIT, Y_LIMIT)
+    reset_indexes()
+    new_cells : Dict[Tuple[int, int], Cell] = {}
+    if "cells" in dictionary:
+        for (x, y, serialisation) in dictionary["cells"]:
+            new_cells[(x, y)] = Cell._from_dict(serialisation, x, y)
+    else:
+        map_dicts = dictionary["map"]
+        for x in range(X_LIMIT):
+            for y in range(Y_LIMIT):
+                cell = Cell._from_dict(map_dicts[x][y], x, y)
+                if not cell.is_default():
+                    new_cells[(x, y)] = cell
+    cells = new_cells
+    for cell in cells.values():
+        cell._changed()